@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency of the long-polling notification consumer.
+
+Starts the fake Green API and AI backend as local processes, preloads a
+notification backlog (as after downtime) and measures how fast the
+consumer drains it: notifications per second and the time from "queued
+at Green API" to "deleted" per notification.
+
+    python -m benchmarks.bench_polling --count 5000 --green-latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.fake_servers import fake_servers
+
+
+async def run(args: argparse.Namespace, green_url: str, ai_url: str) -> dict:
+    # Settings are read at import time, so configure the service first
+    os.environ.update({
+        "API_URL": green_url,
+        "MEDIA_URL": green_url,
+        "AI_BACKEND_URL": ai_url,
+        "GREEN_API_SEND_RATE": "0",
+        "NOTIFICATIONS_RECEIVE_TIMEOUT": "5",
+        "WEBHOOK_QUEUE_SIZE": str(max(args.count * 2, 1000)),
+        "OUTBOUND_QUEUE_PATH": os.path.join(tempfile.mkdtemp(), "queue.sqlite3"),
+    })
+    from src.services.ai_backend_client import ai_backend
+    from src.services.conversation_service import incoming_pipeline
+    from src.services.green_api_client import green_api
+    from src.services.notification_poller import notification_pollers
+
+    notification_poller = notification_pollers[0]
+
+    async with httpx.AsyncClient(base_url=green_url) as control:
+        await control.post("/_fake/notifications", params={"count": args.count, "senders": args.senders})
+
+        await green_api.start()
+        await ai_backend.start()
+        await incoming_pipeline.start()
+        started = time.perf_counter()
+        await notification_poller.start()
+
+        while True:
+            stats = (await control.get("/_fake/stats")).json()
+            if stats["acked"] >= args.count or time.perf_counter() - started > args.timeout:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+        await notification_poller.stop()
+        await incoming_pipeline.stop()
+        await ai_backend.aclose()
+        await green_api.aclose()
+
+    return {
+        "benchmark": "notification_polling",
+        "count": args.count,
+        "acked": stats["acked"],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(stats["acked"] / elapsed, 1) if elapsed else None,
+        "ack_latency_ms": stats["ack_latency_ms"],
+        "green_api_requests": stats["requests"],
+        # Notifications returned again before their delete (each costs an extra receive)
+        "green_api_redelivered": stats["redelivered"],
+        "consumer": {
+            "received": notification_poller.received,
+            "acked": notification_poller.acked,
+            "ack_errors": notification_poller.ack_errors,
+            "receive_errors": notification_poller.receive_errors,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="notifications in the backlog")
+    parser.add_argument("--senders", type=int, default=500, help="distinct phone numbers")
+    parser.add_argument("--green-latency-ms", type=float, default=10.0)
+    parser.add_argument("--ai-latency-ms", type=float, default=50.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    with fake_servers(["--latency-ms", str(args.green_latency_ms)], ["--latency-ms", str(args.ai_latency_ms)]) as (green_url, ai_url):
+        report = asyncio.run(run(args, green_url, ai_url))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Per-webhook CPU time of webhook classification, before and after the fast path.
+
+"before" reproduces the original handler: json.loads of the whole body
+(what ``await request.json()`` does) and dict lookups. "after" is
+src.services.notification_ingest's path: typeWebhook from the raw bytes,
+then TypeAdapter validation for the types it processes only. "ingest"
+is the whole ``ingest_raw`` call for the types it ignores (metrics,
+journal and event stream checks included), which completes without
+suspending.
+
+    python -m benchmarks.bench_webhook_parse --iterations 20000
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from src.services.notification_ingest import ingest_raw
+from src.services.webhook_parser import ADAPTERS, parse_raw, read_type_webhook
+
+INSTANCE = {"idInstance": 1101000001, "wid": "79000000000@c.us", "typeInstance": "whatsapp"}
+SENDER = {"chatId": "79001234567@c.us", "chatName": "Ivan", "sender": "79001234567@c.us", "senderName": "Ivan"}
+
+
+def sample_payloads() -> Dict[str, bytes]:
+    thumbnail = base64.b64encode(os.urandom(24_000)).decode()
+    payloads: Dict[str, Any] = {
+        "incoming_text": {
+            "typeWebhook": "incomingMessageReceived", "instanceData": INSTANCE, "timestamp": 1700000000,
+            "idMessage": "BAE5F4886F6F2D05", "senderData": SENDER,
+            "messageData": {"typeMessage": "textMessage", "textMessageData": {"textMessage": "Здравствуйте, сколько стоит доставка?"}},
+        },
+        "incoming_image": {
+            "typeWebhook": "incomingMessageReceived", "instanceData": INSTANCE, "timestamp": 1700000000,
+            "idMessage": "BAE5F4886F6F2D06", "senderData": SENDER,
+            "messageData": {"typeMessage": "imageMessage", "fileMessageData": {
+                "downloadUrl": "https://sw-media-out.storage.greenapi.net/1101000001/abc.jpg", "caption": "вот фото",
+                "fileName": "abc.jpg", "jpegThumbnail": thumbnail, "mimeType": "image/jpeg"}},
+        },
+        "outgoing_status": {
+            "typeWebhook": "outgoingMessageStatus", "chatId": "79001234567@c.us", "instanceData": INSTANCE,
+            "timestamp": 1700000000, "idMessage": "BAE5F4886F6F2D07", "status": "delivered", "sendByApi": True,
+        },
+        "outgoing_api_message": {
+            "typeWebhook": "outgoingAPIMessageReceived", "instanceData": INSTANCE, "timestamp": 1700000000,
+            "idMessage": "BAE5F4886F6F2D08", "senderData": SENDER,
+            "messageData": {"typeMessage": "imageMessage", "fileMessageData": {
+                "downloadUrl": "https://example.com/catalogue.jpg", "caption": "Новинки", "jpegThumbnail": thumbnail}},
+        },
+        "incoming_call": {
+            "typeWebhook": "incomingCall", "instanceData": INSTANCE, "timestamp": 1700000000,
+            "from": "79001234567@c.us", "status": "offer", "idMessage": "BAE5F4886F6F2D09",
+        },
+        "state_instance": {
+            "typeWebhook": "stateInstanceChanged", "instanceData": INSTANCE, "timestamp": 1700000000,
+            "stateInstance": "authorized",
+        },
+    }
+    return {name: json.dumps(body, ensure_ascii=False).encode() for name, body in payloads.items()}
+
+
+def before(raw: bytes) -> Any:
+    data = json.loads(raw)
+    if "typeWebhook" in data and data.get("typeWebhook") == "incomingMessageReceived":
+        sender = data.get("senderData", {}).get("sender", "")
+        text = data.get("messageData", {}).get("textMessageData", {}).get("textMessage", "")
+        return sender, text
+    return None
+
+
+def after(raw: bytes) -> Any:
+    type_webhook = read_type_webhook(raw)
+    if type_webhook in ADAPTERS:
+        return parse_raw(raw, type_webhook)
+    return None
+
+
+def ingest_ignored(raw: bytes) -> Any:
+    coro = ingest_raw(raw)
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("ingest_raw suspended on an ignored webhook")
+
+
+def cpu_time_per_call(func: Callable[[bytes], Any], raw: bytes, iterations: int) -> float:
+    """Microseconds of process CPU time per call."""
+    func(raw)  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        func(raw)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    for name, raw in sample_payloads().items():
+        before_us = cpu_time_per_call(before, raw, args.iterations)
+        after_us = cpu_time_per_call(after, raw, args.iterations)
+        ingest_us = None
+        if read_type_webhook(raw) not in ADAPTERS:
+            ingest_us = round(cpu_time_per_call(ingest_ignored, raw, args.iterations), 2)
+        results.append({
+            "payload": name,
+            "bytes": len(raw),
+            "before_us": round(before_us, 2),
+            "after_us": round(after_us, 2),
+            "speedup": round(before_us / after_us, 1) if after_us else None,
+            "ingest_us": ingest_us,
+        })
+
+    print(f"{'payload':<22}{'bytes':>8}{'before µs':>12}{'after µs':>12}{'speedup':>10}{'ingest µs':>12}")
+    for row in results:
+        ingest = "-" if row["ingest_us"] is None else row["ingest_us"]
+        print(f"{row['payload']:<22}{row['bytes']:>8}{row['before_us']:>12}{row['after_us']:>12}"
+              f"{row['speedup']:>9}x{ingest:>12}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "webhook_parse", "iterations": args.iterations, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
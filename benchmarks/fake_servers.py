@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Green API and the AI backend used by the benchmarks.
+
+Both servers add configurable latency and inject errors, so the service
+can be measured offline:
+
+    python -m benchmarks.fake_servers green --port 9001 --latency-ms 50
+    python -m benchmarks.fake_servers ai --port 9002 --latency-ms 300 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class Upstream:
+    """Latency and error injection shared by the fake servers."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+
+    async def delay(self, name: str) -> Optional[JSONResponse]:
+        self.requests[name] = self.requests.get(name, 0) + 1
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse(status_code=500, content={"error": "injected failure"})
+        return None
+
+    def configure(self, options: Dict[str, Any]) -> None:
+        for key in ("latency_ms", "jitter_ms", "error_rate"):
+            if key in options:
+                setattr(self, key, float(options[key]))
+
+
+def incoming_message(index: int, phone: Optional[str] = None, text: Optional[str] = None) -> Dict[str, Any]:
+    """A Green API `incomingMessageReceived` webhook body."""
+    phone = phone or f"7900{index % 100000:07d}"
+    return {
+        "typeWebhook": "incomingMessageReceived",
+        "instanceData": {"idInstance": 1101000001, "wid": "79000000000@c.us", "typeInstance": "whatsapp"},
+        "timestamp": int(time.time()),
+        "idMessage": uuid.uuid4().hex.upper(),
+        "senderData": {"chatId": f"{phone}@c.us", "chatName": "Bench", "sender": f"{phone}@c.us", "senderName": "Bench"},
+        "messageData": {"typeMessage": "textMessage", "textMessageData": {"textMessage": text or f"message {index}"}},
+    }
+
+
+def create_green_api_app(upstream: Optional[Upstream] = None) -> FastAPI:
+    """
+    Fake Green API: send* methods, receiveNotification/deleteNotification
+    backed by an in-memory notification queue, and /_fake/* control routes.
+
+    Like Green API, receiveNotification keeps returning the head of the
+    queue, with the same receiptId, until it is deleted.
+    """
+    upstream = upstream or Upstream()
+    app = FastAPI(title="Fake Green API")
+    backlog: Deque[Dict[str, Any]] = deque()
+    # receiptId -> notification received at least once but not deleted yet
+    leased: Dict[int, Dict[str, Any]] = {}
+    receipts = itertools.count(1)
+    arrived = asyncio.Event()
+    ack_latencies: List[float] = []
+    state = {"acked": 0, "redelivered": 0}
+
+    @app.post("/_fake/notifications")
+    async def load_notifications(count: int = 1000, senders: int = 1000):
+        now = time.perf_counter()
+        for i in range(count):
+            backlog.append({"body": incoming_message(i, phone=f"7900{i % senders:07d}"), "queued_at": now})
+        arrived.set()
+        return {"queued": len(backlog)}
+
+    @app.post("/_fake/config")
+    async def configure(request: Request):
+        upstream.configure(await request.json())
+        return {"latency_ms": upstream.latency_ms, "jitter_ms": upstream.jitter_ms, "error_rate": upstream.error_rate}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        latencies = sorted(ack_latencies)
+        return {
+            "requests": upstream.requests,
+            "errors": upstream.errors,
+            "backlog": len(backlog) - len(leased),
+            "leased": len(leased),
+            "redelivered": state["redelivered"],
+            "acked": state["acked"],
+            "ack_latency_ms": latencies_summary(latencies),
+        }
+
+    @app.post("/_fake/reset")
+    async def reset():
+        backlog.clear()
+        leased.clear()
+        ack_latencies.clear()
+        upstream.requests.clear()
+        upstream.errors = 0
+        state["acked"] = 0
+        state["redelivered"] = 0
+        return {"status": "ok"}
+
+    @app.get("/waInstance{id_instance}/receiveNotification/{token}")
+    async def receive_notification(id_instance: str, token: str, receiveTimeout: int = 5):
+        if not backlog:
+            arrived.clear()
+            try:
+                await asyncio.wait_for(arrived.wait(), timeout=receiveTimeout)
+            except asyncio.TimeoutError:
+                return None
+        failure = await upstream.delay("receiveNotification")
+        if failure is not None:
+            return failure
+        if not backlog:
+            return None
+        item = backlog[0]
+        receipt_id = item.get("receipt_id")
+        if receipt_id is None:
+            receipt_id = item["receipt_id"] = next(receipts)
+            leased[receipt_id] = item
+        else:
+            state["redelivered"] += 1
+        return {"receiptId": receipt_id, "body": item["body"]}
+
+    @app.delete("/waInstance{id_instance}/deleteNotification/{token}/{receipt_id}")
+    async def delete_notification(id_instance: str, token: str, receipt_id: int):
+        failure = await upstream.delay("deleteNotification")
+        if failure is not None:
+            return failure
+        item = leased.pop(receipt_id, None)
+        if item is None:
+            return {"result": False}
+        backlog.remove(item)  # the head, unless acks were reordered
+        state["acked"] += 1
+        ack_latencies.append((time.perf_counter() - item["queued_at"]) * 1000)
+        return {"result": True}
+
+    @app.post("/waInstance{id_instance}/{method}/{token}")
+    async def send(id_instance: str, method: str, token: str, request: Request):
+        await request.body()
+        failure = await upstream.delay(method)
+        if failure is not None:
+            return failure
+        response: Dict[str, Any] = {"idMessage": uuid.uuid4().hex.upper()}
+        if method in ("sendFileByUpload", "uploadFile"):
+            response["urlFile"] = f"https://fake-media.local/{uuid.uuid4().hex}"
+        return response
+
+    return app
+
+
+def create_ai_backend_app(upstream: Optional[Upstream] = None, profile_rate: float = 0.3) -> FastAPI:
+    """
+    Fake AI backend: ``profile_rate`` of phones have a profile, the rest get null.
+    """
+    upstream = upstream or Upstream()
+    app = FastAPI(title="Fake AI backend")
+
+    @app.post("/_fake/config")
+    async def configure(request: Request):
+        nonlocal profile_rate
+        options = await request.json()
+        upstream.configure(options)
+        profile_rate = float(options.get("profile_rate", profile_rate))
+        return {"latency_ms": upstream.latency_ms, "error_rate": upstream.error_rate, "profile_rate": profile_rate}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {"requests": upstream.requests, "errors": upstream.errors}
+
+    @app.post("/_fake/reset")
+    async def reset():
+        upstream.requests.clear()
+        upstream.errors = 0
+        return {"status": "ok"}
+
+    @app.api_route("/ai/{route}", methods=["GET", "POST", "DELETE"])
+    async def ai_route(route: str, request: Request):
+        body = await request.json() if await request.body() else {}
+        failure = await upstream.delay(route)
+        if failure is not None:
+            return failure
+        if route == "getProfile":
+            phone = body.get("client_phone", "")
+            # Deterministic per phone so caching behaves like production
+            if (zlib.crc32(phone.encode()) % 1000) / 1000 < profile_rate:
+                return {"client_phone": phone, "name": "Bench"}
+            return None
+        return {"status": "ok"}
+
+    return app
+
+
+def latencies_summary(sorted_ms: List[float]) -> Dict[str, Any]:
+    if not sorted_ms:
+        return {"count": 0}
+
+    def pct(p: float) -> float:
+        return round(sorted_ms[min(len(sorted_ms) - 1, int(p / 100 * len(sorted_ms)))], 2)
+
+    return {
+        "count": len(sorted_ms),
+        "mean": round(sum(sorted_ms) / len(sorted_ms), 2),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+        "max": round(sorted_ms[-1], 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not start")
+
+
+@contextmanager
+def fake_servers(green_args: List[str], ai_args: List[str]) -> Iterator[tuple]:
+    """Run the fake Green API and AI backend, yield their base URLs."""
+    green_port, ai_port = free_port(), free_port()
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.fake_servers", "green", "--port", str(green_port), *green_args]),
+        subprocess.Popen([sys.executable, "-m", "benchmarks.fake_servers", "ai", "--port", str(ai_port), *ai_args]),
+    ]
+    try:
+        green_url, ai_url = f"http://127.0.0.1:{green_port}", f"http://127.0.0.1:{ai_port}"
+        wait_until_up(f"{green_url}/_fake/stats")
+        wait_until_up(f"{ai_url}/_fake/stats")
+        yield green_url, ai_url
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["green", "ai"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--profile-rate", type=float, default=0.3, help="AI backend only")
+    args = parser.parse_args()
+
+    upstream = Upstream(args.latency_ms, args.jitter_ms, args.error_rate)
+    if args.service == "green":
+        app = create_green_api_app(upstream)
+    else:
+        app = create_ai_backend_app(upstream, args.profile_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
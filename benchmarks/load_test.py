@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Load test of the HTTP endpoints against local fake upstreams.
+
+Starts the fake Green API and AI backend, runs the service itself with
+uvicorn pointed at them, then drives `/webhook`, `/send-message` and
+`/sendFile` one after another at a fixed request rate and reports
+throughput and latency percentiles per endpoint as JSON.
+
+Requests are sent open-loop: each one is started at its scheduled time
+whether or not earlier ones have finished, and latency is measured from
+that scheduled time, so a stalled service shows up as latency instead of
+silently lowering the request rate.
+
+    python -m benchmarks.load_test --rate 200 --duration 20 --output before.json
+    python -m benchmarks.load_test --scenarios webhook --rate 1000 --ai-latency-ms 800
+    python -m benchmarks.load_test --green-latency-ms 100 --green-error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import httpx
+import orjson
+
+from benchmarks.fake_servers import fake_servers, free_port, incoming_message, latencies_summary, wait_until_up
+
+SCENARIOS = ("webhook", "send-message", "sendFile")
+
+# idInstance used in the fake webhook bodies
+FAKE_INSTANCE_ID = 1101000001
+
+
+def status_webhook(index: int) -> Dict[str, Any]:
+    """A Green API `outgoingMessageStatus` webhook body."""
+    return {
+        "typeWebhook": "outgoingMessageStatus",
+        "instanceData": {"idInstance": FAKE_INSTANCE_ID, "wid": "79000000000@c.us", "typeInstance": "whatsapp"},
+        "timestamp": int(time.time()),
+        "idMessage": f"STATUS{index:012d}",
+        "status": "delivered",
+        "chatId": f"7900{index % 100000:07d}@c.us",
+        "sendByApi": True,
+    }
+
+
+def request_factory(scenario: str, args: argparse.Namespace) -> Callable[[int], Tuple[str, bytes]]:
+    """Return a function building the (path, JSON body) of the i-th request."""
+    if scenario == "webhook":
+        def build(i: int) -> Tuple[str, bytes]:
+            if random.random() < args.status_share:
+                return "/webhook", orjson.dumps(status_webhook(i))
+            return "/webhook", orjson.dumps(incoming_message(i, phone=f"7900{i % args.senders:07d}"))
+    elif scenario == "send-message":
+        def build(i: int) -> Tuple[str, bytes]:
+            body = {"recipient": f"+7900{i % args.senders:07d}", "message": f"Load test message {i}"}
+            return "/send-message", orjson.dumps(body)
+    else:
+        def build(i: int) -> Tuple[str, bytes]:
+            body = {"recipient": f"+7900{i % args.senders:07d}", "file_url": f"https://example.com/catalogue/{i % 50}.jpg",
+                    "caption": "Load test", "extension": "jpg"}
+            return "/sendFile", orjson.dumps(body)
+    return build
+
+
+@contextmanager
+def service(green_url: str, ai_url: str, args: argparse.Namespace) -> Iterator[str]:
+    """Run the service under test with uvicorn, yield its base URL."""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "ID_INSTANCE": str(FAKE_INSTANCE_ID),
+        "API_URL": green_url,
+        "MEDIA_URL": green_url,
+        "AI_BACKEND_URL": ai_url,
+        "GREEN_API_SEND_RATE": str(args.send_rate),
+        "NOTIFICATIONS_POLLING_ENABLED": "false",
+        "WEBHOOK_QUEUE_SIZE": str(args.webhook_queue_size),
+        "OUTBOUND_QUEUE_PATH": os.path.join(tempfile.mkdtemp(), "queue.sqlite3"),
+        # A replayed journal must not be written back into itself
+        "JOURNAL_ENABLED": "false",
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_until_up(f"{url}/")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def drive(client: httpx.AsyncClient, build: Callable[[int], Tuple[str, bytes]],
+                rate: float, duration: float, max_in_flight: int) -> Dict[str, Any]:
+    """Send requests at ``rate`` per second for ``duration`` seconds."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    total = int(rate * duration)
+    headers = {"Content-Type": "application/json"}
+
+    async def one(i: int, scheduled: float) -> None:
+        path, body = build(i)
+        try:
+            response = await client.post(path, content=body, headers=headers)
+            key = str(response.status_code)
+        except httpx.HTTPError as e:
+            key = type(e).__name__
+        finally:
+            slots.release()
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        statuses[key] = statuses.get(key, 0) + 1
+
+    started = time.perf_counter()
+    for i in range(total):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Time spent waiting for a slot counts as latency (scheduled time is kept)
+        await slots.acquire()
+        task = asyncio.create_task(one(i, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    sent_in = time.perf_counter() - started
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "target_rate": rate,
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "statuses": statuses,
+        "achieved_rate": round(total / sent_in, 1) if sent_in else None,
+        "throughput_per_s": round(ok / elapsed, 1) if elapsed else None,
+        "elapsed_s": round(elapsed, 3),
+        "latency_ms": latencies_summary(sorted(latencies)),
+    }
+
+
+async def wait_for_pipeline(client: httpx.AsyncClient, timeout: float) -> None:
+    """Wait until the incoming pipeline has no pending or running batches."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        busy = 0.0
+        for line in (await client.get("/metrics")).text.splitlines():
+            if line.startswith(("incoming_pipeline_pending ", "incoming_pipeline_running ")):
+                busy += float(line.split()[1])
+        if not busy:
+            return
+        await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace, green_url: str, ai_url: str, service_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=service_url, limits=limits, timeout=args.request_timeout) as client, \
+            httpx.AsyncClient() as control:
+        for scenario in args.scenarios:
+            build = request_factory(scenario, args)
+            if args.warmup:
+                await drive(client, build, args.rate, args.warmup, args.max_in_flight)
+                await wait_for_pipeline(client, args.settle)
+            await control.post(f"{green_url}/_fake/reset")
+            await control.post(f"{ai_url}/_fake/reset")
+
+            result = await drive(client, build, args.rate, args.duration, args.max_in_flight)
+            if scenario == "webhook":
+                # Let the background pipeline finish talking to the AI backend
+                await wait_for_pipeline(client, args.settle)
+            result["upstream_requests"] = {
+                "green_api": (await control.get(f"{green_url}/_fake/stats")).json()["requests"],
+                "ai_backend": (await control.get(f"{ai_url}/_fake/stats")).json()["requests"],
+            }
+            results[scenario] = result
+            print(f"{scenario}: {result['throughput_per_s']}/s, p50 {result['latency_ms'].get('p50')} ms, "
+                  f"p99 {result['latency_ms'].get('p99')} ms, errors {result['errors']}", file=sys.stderr)
+
+    return {
+        "benchmark": "load_test",
+        "config": {
+            "rate": args.rate,
+            "duration_s": args.duration,
+            "max_in_flight": args.max_in_flight,
+            "senders": args.senders,
+            "status_share": args.status_share,
+            "send_rate": args.send_rate,
+            "green_api": {"latency_ms": args.green_latency_ms, "jitter_ms": args.green_jitter_ms,
+                          "error_rate": args.green_error_rate},
+            "ai_backend": {"latency_ms": args.ai_latency_ms, "jitter_ms": args.ai_jitter_ms,
+                           "error_rate": args.ai_error_rate},
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--rate", type=float, default=100.0, help="requests per second per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of unmeasured traffic before each scenario")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="cap on concurrent requests")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--senders", type=int, default=1000, help="distinct phone numbers")
+    parser.add_argument("--status-share", type=float, default=0.5,
+                        help="share of /webhook requests that are outgoingMessageStatus")
+    parser.add_argument("--settle", type=float, default=60.0,
+                        help="max seconds to wait for background webhook processing to finish")
+    parser.add_argument("--send-rate", type=float, default=0.0,
+                        help="GREEN_API_SEND_RATE of the service under test (0 disables pacing)")
+    parser.add_argument("--webhook-queue-size", type=int, default=100000)
+    parser.add_argument("--green-latency-ms", type=float, default=20.0)
+    parser.add_argument("--green-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--green-error-rate", type=float, default=0.0)
+    parser.add_argument("--ai-latency-ms", type=float, default=200.0)
+    parser.add_argument("--ai-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--ai-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    green_args = ["--latency-ms", str(args.green_latency_ms), "--jitter-ms", str(args.green_jitter_ms),
+                  "--error-rate", str(args.green_error_rate)]
+    ai_args = ["--latency-ms", str(args.ai_latency_ms), "--jitter-ms", str(args.ai_jitter_ms),
+               "--error-rate", str(args.ai_error_rate)]
+    with fake_servers(green_args, ai_args) as (green_url, ai_url):
+        with service(green_url, ai_url, args) as service_url:
+            report = asyncio.run(run(args, green_url, ai_url, service_url))
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Replay journaled traffic (see src/services/journal.py) against the service.
+
+Webhook and long-polling notifications are posted to `/webhook`, sends to
+`/send-message` or `/sendFile`, keeping the original spacing between
+records divided by ``--speed`` (``--speed max`` sends as fast as
+``--max-in-flight`` allows). Like load_test, requests are sent open-loop
+and latency is measured from the scheduled time.
+
+Without ``--target`` the fake upstreams and the service are started
+locally (as in load_test), so production traffic can be replayed without
+touching WhatsApp or the AI backend. With ``--target`` the journal is
+replayed against a running instance - point it at a sandbox, since sends
+are real sends.
+
+    python -m benchmarks.replay --journal data/journal --speed 1
+    python -m benchmarks.replay --journal data/journal --speed 10 --kinds webhook,notification
+    python -m benchmarks.replay --journal incident/ --since 1718000000 --until 1718000600 --speed max
+    python -m benchmarks.replay --journal data/journal --target http://127.0.0.1:8000 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import orjson
+
+from benchmarks.fake_servers import fake_servers, latencies_summary
+from benchmarks.load_test import service
+from src.services.journal import read_journal
+
+KINDS = ("webhook", "notification", "send")
+
+SEND_PATHS = {"message": "/send-message", "file": "/sendFile"}
+
+
+def to_request(record: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
+    """The (path, body) that reproduces a journal record, None for unknown records."""
+    kind = record.get("k")
+    if kind == "webhook":
+        return "/webhook", record["raw"].encode()
+    if kind == "notification":
+        return "/webhook", orjson.dumps(record["body"])
+    if kind == "send" and record.get("kind") in SEND_PATHS:
+        return SEND_PATHS[record["kind"]], orjson.dumps(record["request"])
+    return None
+
+
+def select(records: Iterator[Dict[str, Any]], kinds: List[str], limit: Optional[int]) -> Iterator[Dict[str, Any]]:
+    count = 0
+    for record in records:
+        if record.get("k") not in kinds:
+            continue
+        if limit is not None and count >= limit:
+            return
+        count += 1
+        yield record
+
+
+async def replay(client: httpx.AsyncClient, records: Iterator[Dict[str, Any]], speed: float,
+                 max_in_flight: int) -> Dict[str, Any]:
+    """Send the records, ``speed`` times faster than recorded (0 = as fast as possible)."""
+    per_path: Dict[str, Dict[str, Any]] = {}
+    slots = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    headers = {"Content-Type": "application/json"}
+    lag: List[float] = []
+
+    async def one(path: str, body: bytes, scheduled: float) -> None:
+        try:
+            response = await client.post(path, content=body, headers=headers)
+            key = str(response.status_code)
+        except Exception as e:  # counted by name, like any status
+            key = type(e).__name__
+        finally:
+            slots.release()
+        stats = per_path.setdefault(path, {"statuses": {}, "latencies": []})
+        stats["latencies"].append((time.perf_counter() - scheduled) * 1000)
+        stats["statuses"][key] = stats["statuses"].get(key, 0) + 1
+
+    started = time.perf_counter()
+    first_t: Optional[float] = None
+    total = 0
+    for record in records:
+        request = to_request(record)
+        if request is None:
+            continue
+        if first_t is None:
+            first_t = record["t"]
+        if speed > 0:
+            scheduled = started + (record["t"] - first_t) / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await slots.acquire()
+        now = time.perf_counter()
+        if speed > 0:
+            lag.append((now - scheduled) * 1000)
+        else:
+            scheduled = now
+        task = asyncio.create_task(one(*request, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        total += 1
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for path, stats in per_path.items():
+        ok = sum(count for status, count in stats["statuses"].items() if status.startswith("2"))
+        endpoints[path] = {
+            "requests": len(stats["latencies"]),
+            "ok": ok,
+            "statuses": stats["statuses"],
+            "latency_ms": latencies_summary(sorted(stats["latencies"])),
+        }
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "rate": round(total / elapsed, 1) if elapsed else None,
+        # How late requests were started relative to the replay schedule (client saturation)
+        "schedule_lag_ms": latencies_summary(sorted(lag)),
+        "endpoints": endpoints,
+    }
+
+
+async def run(args: argparse.Namespace, target: str) -> Dict[str, Any]:
+    records = select(read_journal(args.journal, since=args.since, until=args.until), args.kinds, args.limit)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.request_timeout) as client:
+        result = await replay(client, records, args.speed, args.max_in_flight)
+    return {
+        "benchmark": "replay",
+        "config": {
+            "journal": args.journal,
+            "target": args.target or "local",
+            "speed": args.speed or "max",
+            "kinds": args.kinds,
+            "since": args.since,
+            "until": args.until,
+        },
+        **result,
+    }
+
+
+def parse_speed(value: str) -> float:
+    if value == "max":
+        return 0.0
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--journal", default="data/journal", help="journal directory")
+    parser.add_argument("--target", help="base URL of a running service; default: start one against fakes")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="N times the recorded pace, or 'max'")
+    parser.add_argument("--kinds", type=lambda s: s.split(","), default=list(KINDS),
+                        help=f"comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--since", type=float, help="only records at or after this Unix time")
+    parser.add_argument("--until", type=float, help="only records before this Unix time")
+    parser.add_argument("--limit", type=int, help="replay at most this many records")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="cap on concurrent requests")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    # Local service (no --target)
+    parser.add_argument("--send-rate", type=float, default=0.0,
+                        help="GREEN_API_SEND_RATE of the local service (0 disables pacing)")
+    parser.add_argument("--webhook-queue-size", type=int, default=100000)
+    parser.add_argument("--green-latency-ms", type=float, default=20.0)
+    parser.add_argument("--ai-latency-ms", type=float, default=200.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+
+    if args.target:
+        report = asyncio.run(run(args, args.target))
+    else:
+        green_args = ["--latency-ms", str(args.green_latency_ms)]
+        ai_args = ["--latency-ms", str(args.ai_latency_ms)]
+        with fake_servers(green_args, ai_args) as (green_url, ai_url):
+            with service(green_url, ai_url, args) as service_url:
+                report = asyncio.run(run(args, service_url))
+
+    print(f"replayed {report['requests']} requests in {report['elapsed_s']} s", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,164 @@
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+
+class GreenApiInstanceConfig(BaseModel):
+    """One Green API instance (WhatsApp number) of the sending pool."""
+    id_instance: str
+    api_token_instance: str
+    api_url: Optional[str] = None  # defaults to Settings.api_url
+    media_url: Optional[str] = None  # defaults to Settings.media_url
+
+
 class Settings(BaseSettings):
     id_instance: str = "YOUR_GREENAPI_ID_INSTANCE"
     api_token_instance: str = "YOUR_GREENAPI_API_TOKEN_INSTANCE"
     api_url: str = "https://api.green-api.com"
     media_url: str = "https://1103.media.green-api.com"
 
+    # Worker processes; uvicorn reads the same WEB_CONCURRENCY variable
+    web_concurrency: int = 1
+    # Where state shared by workers lives (caches, dedup, leases, send rate limits):
+    #   memory - in-process, only valid with a single worker
+    #   sqlite - SQLite file in WAL mode, shared by all workers on the host
+    state_backend: Literal["memory", "sqlite"] = "memory"
+    state_path: str = "data/state.sqlite3"
+    # How often the sqlite backend deletes expired entries and trims namespaces to their size
+    state_purge_interval: float = 60.0
+    # A chat is processed by one worker at a time; the lease frees itself if that worker dies
+    chat_lease_ttl: float = 120.0
+
+    # Pool of instances as JSON, e.g.
+    # GREEN_API_INSTANCES='[{"id_instance": "1101", "api_token_instance": "..."}, ...]'
+    # When empty, the single id_instance/api_token_instance above is used.
+    green_api_instances: List[GreenApiInstanceConfig] = []
+    # Consecutive failures after which an instance is taken out of rotation
+    instance_failure_threshold: int = 3
+    instance_cooldown: float = 30.0
+    instance_virtual_nodes: int = 100
+    # phone -> instance the customer last wrote to, replies go through it
+    instance_affinity_size: int = 100000
+    instance_affinity_ttl: float = 7 * 24 * 3600
+
+    # Green API HTTP client (connection pool shared by all requests)
+    green_api_timeout: float = 10.0
+    green_api_connect_timeout: float = 5.0
+    green_api_max_connections: int = 100
+    green_api_max_keepalive_connections: int = 20
+    green_api_keepalive_expiry: float = 30.0
+    green_api_http2: bool = False  # requires the optional `h2` package
+    # Per-instance pacing of send* methods (token bucket), 0 disables it
+    green_api_send_rate: float = 5.0
+    green_api_send_burst: float = 5.0
+
+    # Idempotency-Key on /send-message and /sendFile: successful responses are replayed
+    # for this long, and a send in progress blocks repeats for at most idempotency_in_flight_ttl
+    idempotency_ttl: float = 24 * 3600
+    idempotency_cache_size: int = 100000
+    idempotency_in_flight_ttl: float = 300.0
+
+    # Bulk sending
+    bulk_send_concurrency: int = 20
+    # Phones reset at the same time by /resetConversations
+    bulk_reset_concurrency: int = 10
+
+    # Multi-part replies (/send-compound)
+    compound_max_text_length: int = 4096  # longer texts are sent as several messages
+    compound_prefetch_concurrency: int = 4  # `upload` files prepared ahead of their turn
+
+    # sendFileByUpload relay (`"mode": "upload"` in /sendFile, /sendFileUpload)
+    media_cache_size: int = 10000  # content hash -> Green API urlFile entries
+    media_cache_ttl: float = 24 * 3600
+    media_source_ttl: float = 600.0  # how long a source URL is assumed to keep its content
+    media_spool_memory: int = 1024 * 1024  # larger files are buffered on disk
+    media_max_bytes: int = 100 * 1024 * 1024
+    media_download_timeout: float = 60.0
+    media_upload_timeout: float = 120.0
+
+    # Durable outbound queue (`?enqueue=true` on the send endpoints)
+    outbound_queue_path: str = "data/outbound_queue.sqlite3"
+    outbound_workers: int = 4
+    outbound_max_attempts: int = 8
+    outbound_backoff_base: float = 2.0
+    outbound_backoff_max: float = 300.0
+    outbound_poll_interval: float = 5.0
+    outbound_job_retention: float = 7 * 24 * 3600
+    # An in-progress job not finished within this time (its worker died) is queued again
+    outbound_job_lease: float = 300.0
+
+    # AI backend
+    ai_backend_url: str = "http://51.250.42.45:2025"
+    # Default timeout; routes listed in AI_BACKEND_ROUTE_TIMEOUTS (JSON object) get their own
+    ai_backend_timeout: float = 60.0
+    ai_backend_route_timeouts: Dict[str, float] = {
+        "getProfile": 5.0,
+        "processConversation": 60.0,
+        "resetConversation": 10.0,
+        "initConversation": 10.0,
+    }
+    # Adaptive concurrency limit per route, driven by observed latency
+    ai_backend_initial_concurrency: int = 10
+    ai_backend_min_concurrency: int = 1
+    ai_backend_max_concurrency: int = 100
+    # A call this many times slower than the moving average counts as a sign of overload
+    ai_backend_latency_tolerance: float = 2.0
+    # Calls waiting for a slot beyond these limits are shed
+    ai_backend_max_waiters: int = 200
+    ai_backend_max_wait: float = 10.0
+    # Circuit breaker: open after this many consecutive failures, probe again after the pause
+    ai_backend_breaker_failures: int = 5
+    ai_backend_breaker_open_seconds: float = 15.0
+
+    # Incoming message pipeline (webhook -> AI backend)
+    webhook_workers: int = 8
+    webhook_queue_size: int = 1000
+    # What to do when the queue is full:
+    #   reject      - answer 503 so Green API redelivers the webhook later
+    #   drop_newest - acknowledge and discard the incoming message
+    #   drop_oldest - discard the oldest queued message to make room
+    webhook_queue_overflow: Literal["reject", "drop_newest", "drop_oldest"] = "reject"
+    webhook_drain_timeout: float = 10.0
+    # Messages from one sender arriving within this window are sent to the AI backend together
+    webhook_debounce_seconds: float = 1.5
+    # Upper bound on how long the first message of a burst may wait
+    webhook_debounce_max_delay: float = 5.0
+
+    # Long-polling consumer (receiveNotification) for deployments without a public /webhook
+    notifications_polling_enabled: bool = False
+    notifications_receive_timeout: int = 5  # seconds, Green API accepts 5-60
+    notifications_error_backoff: float = 1.0
+
+    # Append-only journal of incoming notifications and outbound sends (for replay)
+    journal_enabled: bool = False
+    journal_path: str = "data/journal"
+    journal_segment_bytes: int = 64 * 1024 * 1024  # compressed size after which a new segment starts
+    journal_max_segments: int = 100  # older segments are deleted
+    journal_flush_interval: float = 1.0
+    journal_batch_size: int = 1000
+    # Records waiting for the writer; beyond this they are dropped instead of delaying requests
+    journal_buffer_size: int = 100000
+
+    # Delivery statuses of sent messages (outgoingMessageStatus webhooks) by idMessage
+    delivery_status_size: int = 200000
+    delivery_status_ttl: float = 3 * 24 * 3600
+
+    # Live event stream (/events, /events/ws): events buffered per subscriber before it is
+    # dropped as too slow, and the SSE keep-alive interval
+    event_stream_buffer: int = 1000
+    event_stream_max_subscribers: int = 100
+    event_stream_heartbeat: float = 15.0
+
+    # Redelivered webhooks are recognised by idMessage within this window
+    webhook_dedup_size: int = 100000
+    webhook_dedup_ttl: float = 3600.0
+
+    # /ai/getProfile cache (negative = phone has no profile)
+    profile_cache_size: int = 50000
+    profile_cache_ttl: float = 300.0
+    profile_cache_negative_ttl: float = 60.0
+
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
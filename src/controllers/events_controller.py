@@ -0,0 +1,118 @@
+"""
+Live stream of incoming Green API events for dashboards and analytics.
+Served as Server-Sent Events and over WebSocket from the same hub.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from src.config.settings import settings
+from src.services.event_hub import Subscriber, TooManySubscribersError, event_hub
+
+router = APIRouter()
+
+_PHONE_QUERY = Query([], description="Only events of these phones (repeat the parameter for several)")
+_TYPE_QUERY = Query([], description="Only these typeWebhook values, e.g. incomingMessageReceived")
+_MESSAGE_TYPE_QUERY = Query([], description="Only these typeMessage values, e.g. textMessage")
+
+
+def _subscribe(phone: List[str], type: List[str], message_type: List[str]) -> Subscriber:
+    return event_hub.subscribe(Subscriber(phones=phone, types=type, message_types=message_type))
+
+
+async def _sse_stream(subscriber: Subscriber) -> AsyncIterator[bytes]:
+    try:
+        while True:
+            event = await subscriber.next(timeout=settings.event_stream_heartbeat)
+            if event is not None:
+                yield b"id: %d\nevent: %s\ndata: %s\n\n" % (
+                    event["seq"], event["type"].encode(), orjson.dumps(event))
+            elif subscriber.closed:
+                yield b"event: close\ndata: %s\n\n" % orjson.dumps({"reason": subscriber.close_reason})
+                return
+            else:
+                # Keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+    finally:
+        event_hub.unsubscribe(subscriber)
+
+
+@router.get(
+    "/events",
+    summary="Live event stream (SSE)",
+    description="Server-Sent Events stream of incoming messages and other Green API notifications"
+)
+async def stream_events(
+    phone: List[str] = _PHONE_QUERY,
+    type: List[str] = _TYPE_QUERY,
+    message_type: List[str] = _MESSAGE_TYPE_QUERY,
+) -> StreamingResponse:
+    """
+    Each event is sent with its `typeWebhook` as the SSE event name and the
+    normalised event as JSON data. A consumer that falls too far behind is
+    sent a final `close` event and disconnected.
+    """
+    try:
+        subscriber = _subscribe(phone, type, message_type)
+    except TooManySubscribersError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        _sse_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/events/ws")
+async def stream_events_ws(
+    websocket: WebSocket,
+    phone: List[str] = _PHONE_QUERY,
+    type: List[str] = _TYPE_QUERY,
+    message_type: List[str] = _MESSAGE_TYPE_QUERY,
+) -> None:
+    """
+    Same events as `/events`, one JSON text frame per event. Messages from
+    the client are ignored. A consumer that falls too far behind is closed
+    with code 1008.
+    """
+    try:
+        subscriber = _subscribe(phone, type, message_type)
+    except TooManySubscribersError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+    await websocket.accept()
+
+    async def watch_disconnect() -> None:
+        # Frees the subscription of a client that went away while no events were flowing
+        try:
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            subscriber.close("disconnected")
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        while (event := await subscriber.next()) is not None:
+            await websocket.send_text(orjson.dumps(event).decode())
+        if subscriber.close_reason != "disconnected":
+            code = 1008 if subscriber.close_reason == "slow consumer" else 1001
+            await websocket.close(code=code, reason=subscriber.close_reason or "")
+    except (WebSocketDisconnect, RuntimeError):
+        # The client is gone; RuntimeError is raised when sending after a close
+        pass
+    finally:
+        watcher.cancel()
+        event_hub.unsubscribe(subscriber)
+
+
+@router.get(
+    "/events/stats",
+    summary="Live event stream statistics",
+    description="Connected subscribers, published events and slow consumers dropped"
+)
+async def event_stream_stats() -> Dict[str, Any]:
+    return event_hub.stats()
@@ -1,41 +1,235 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from typing import List, Optional
-import requests
 from src.models.whatsapp_message import WhatsAppMessageRequest, WhatsAppFileRequest
-from src.services.whatsapp_service import send_whatsapp_message, send_whatsapp_file
+from src.services.whatsapp_service import send_whatsapp_message, send_whatsapp_file, send_whatsapp_upload, validate_message_request
+from src.services.media_relay import media_relay
 from src.controllers.webhook_controller import router as webhook_router
-from src.models.whatsapp_message import ResetConversationRequest
+from src.controllers.events_controller import router as events_router
+from src.models.whatsapp_message import ResetConversationRequest, BulkResetConversationRequest, BulkSendRequest, MessageStatusRequest, CompoundSendRequest
+from src.services.bulk_service import send_bulk
+from src.services.compound_service import send_compound
+from src.services.reset_service import reset_conversation as reset_client_conversation, reset_bulk
+from src.services.green_api_client import green_api
+from src.services.ai_backend_client import ai_backend
+from src.services.conversation_service import incoming_pipeline
+from src.services.profile_cache import profile_cache
+from src.services.outbound_queue import outbound_queue
+from src.services.notification_poller import notification_pollers
+from src.services.instance_pool import instance_pool
+from src.services.runtime_metrics import InFlightMiddleware
+from src.services.state_backend import state_backend
+from src.services.event_hub import event_hub
+from src.services.journal import journal
+from src.services.delivery_status import delivery_status
+from src.services.idempotency import idempotency_store, idempotent_response
+from src.utils.metrics import registry
+from src.config.settings import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open shared upstream connection pools on startup and close them on shutdown.
+    """
+    if settings.web_concurrency > 1 and not state_backend.shared:
+        raise RuntimeError("WEB_CONCURRENCY > 1 requires a shared state backend (STATE_BACKEND=sqlite)")
+    await state_backend.start()
+    await journal.start()
+    await green_api.start()
+    await ai_backend.start()
+    await incoming_pipeline.start()
+    await outbound_queue.start()
+    if settings.notifications_polling_enabled:
+        for poller in notification_pollers:
+            await poller.start()
+    try:
+        yield
+    finally:
+        for poller in notification_pollers:
+            await poller.stop()
+        # Ends open event streams so the server does not wait for them
+        await event_hub.aclose()
+        await outbound_queue.stop()
+        await incoming_pipeline.stop()
+        await ai_backend.aclose()
+        await green_api.aclose()
+        await journal.stop()
+        await state_backend.aclose()
+
 
 app = FastAPI(
     title="WhatsApp Messaging API", 
     description="API to send and receive messages from WhatsApp accounts via Green API.", 
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(InFlightMiddleware)
+
 # Include routers
 app.include_router(webhook_router, tags=["Webhook"])
+app.include_router(events_router, tags=["Events"])
+
+
+IDEMPOTENCY_KEY = Header(
+    None, alias="Idempotency-Key", max_length=255,
+    description="Repeats with the same key get the first response instead of sending again",
+)
 
 
 @app.post("/send-message", summary="Send a WhatsApp message", response_description="Message sent successfully")
-async def send_message(request: WhatsAppMessageRequest):
+async def send_message(request: WhatsAppMessageRequest, enqueue: bool = False,
+                       idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
     """
     Send a WhatsApp message to a recipient.
+
+    - **enqueue**: put the message on the durable outbound queue and return `202` with a job id
+    - **Idempotency-Key** (header): a retry with the same key is not sent again
     """
-    response = await send_whatsapp_message(request)
-    return response
+    async def send():
+        if enqueue:
+            validate_message_request(request)
+            return 202, await outbound_queue.enqueue(request)
+        return 200, await send_whatsapp_message(request)
+
+    return await idempotent_response(
+        idempotency_key, "send-message", [request.model_dump(mode="json"), enqueue], send)
 
 
 @app.post("/sendFile", summary="Send multiple images to WhatsApp", response_description="File sent successfully")
-async def send_images(request: WhatsAppFileRequest):
+async def send_images(request: WhatsAppFileRequest, enqueue: bool = False,
+                      idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
     """
     Send multiple file to a WhatsApp recipient using image URLs.
     
     - **recipient**: Phone number in international format (e.g., +1234567890)
     - **image_urls**: List of image URLs to send
     - **caption**: Optional caption for the first image
+    - **enqueue**: put the file on the durable outbound queue and return `202` with a job id
+    - **Idempotency-Key** (header): a retry with the same key is not sent again
+    """
+    async def send():
+        if enqueue:
+            return 202, await outbound_queue.enqueue(request)
+        return 200, await send_whatsapp_file(request)
+
+    return await idempotent_response(
+        idempotency_key, "sendFile", [request.model_dump(mode="json"), enqueue], send)
+
+
+@app.post("/sendFileUpload", summary="Upload a file to WhatsApp", response_description="File sent successfully")
+async def send_file_upload(
+    recipient: str = Form(..., description="Phone number in international format, e.g., +1234567890"),
+    file: UploadFile = File(..., description="The file to send"),
+    caption: Optional[str] = Form(None, description="Optional caption"),
+):
+    """
+    Send a file posted to this service (for files Green API cannot download itself).
+
+    The file is streamed to Green API with sendFileByUpload; identical files are uploaded once.
+    """
+    if not recipient.startswith('+') or not recipient[1:].isdigit():
+        raise HTTPException(status_code=400, detail="Recipient must be in international format, e.g., +1234567890.")
+    return await send_whatsapp_upload(recipient, file, caption)
+
+
+@app.get("/media-cache/stats", summary="Media upload cache statistics", description="Hits and traffic saved by the upload cache")
+async def media_cache_stats():
+    """
+    Upload cache counters for tuning its size and TTLs.
+    """
+    return media_relay.stats()
+
+
+@app.get("/jobs/{job_id}", summary="Outbound job status", description="Status of a message queued with `enqueue=true`")
+async def get_job(job_id: str):
+    """
+    Status of a queued send: `queued`, `in_progress`, `sent` or `dead`.
+    """
+    job = await outbound_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/message-status", summary="Delivery statuses of sent messages", description="Batched status lookup answered from the local status index")
+async def message_statuses(request: MessageStatusRequest):
+    """
+    Latest known status of every `idMessage` (`accepted`, `sent`, `delivered`, `read`, `failed`...),
+    or `null` for ids that are unknown or expired. Green API is not called.
+    """
+    statuses = await delivery_status.get_many(request.id_messages)
+    found = sum(1 for status in statuses.values() if status is not None)
+    return {"statuses": statuses, "found": found, "missing": len(statuses) - found}
+
+
+@app.get("/message-status/{id_message}", summary="Delivery status of a sent message", description="Status lookup answered from the local status index")
+async def message_status(id_message: str):
+    """
+    Latest known status of one sent message.
+    """
+    status = (await delivery_status.get_many([id_message]))[id_message]
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired idMessage")
+    return {"id_message": id_message, **status}
+
+
+@app.get("/idempotency/stats", summary="Idempotency key statistics", description="Sends executed, replayed and coalesced by Idempotency-Key")
+async def idempotency_stats():
+    """
+    Counters of the Idempotency-Key store; `replayed` and `coalesced` are duplicate sends avoided.
+    """
+    return idempotency_store.stats()
+
+
+@app.get("/delivery-status/stats", summary="Delivery status index statistics", description="Size and hit counters of the status index")
+async def delivery_status_stats():
+    """
+    Status index counters; `out_of_order` counts notifications older than the known status.
     """
-    response = await send_whatsapp_file(request)
-    return response
+    return delivery_status.stats()
+
+
+@app.post("/send-compound", summary="Send a multi-part reply", response_description="Per-message results")
+async def send_compound_reply(request: CompoundSendRequest, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+    """
+    Send texts and files to one recipient, in the order given.
+
+    - **parts**: `{"type": "text", "text": ...}` and `{"type": "file", "file_url": ...}` items;
+      texts longer than `COMPOUND_MAX_TEXT_LENGTH` are split on sentence boundaries
+    - **stop_on_error**: skip the remaining parts once one fails (default)
+    - **Idempotency-Key** (header): a retry with the same key is not sent again
+
+    Files in `upload` mode are downloaded and uploaded while the earlier parts
+    are being sent. Answers `200` when every message was sent, otherwise `502`
+    with the same body, where `results` tells which messages went out. A retry
+    with the same Idempotency-Key after a partly sent reply gets that `502`
+    again instead of sending the delivered messages twice.
+    """
+    async def send():
+        result = await send_compound(request)
+        return (200 if result["status"] == "ok" else 502), result
+
+    def keep(status_code: int, body: dict) -> bool:
+        # Once a message went out, running the reply again would duplicate it
+        return status_code < 300 or body["sent"] > 0
+
+    return await idempotent_response(idempotency_key, "send-compound", request.model_dump(mode="json"), send, keep)
+
+
+@app.post("/send-bulk", summary="Send many messages and files", response_description="NDJSON stream of per-item results")
+async def send_bulk_messages(request: BulkSendRequest):
+    """
+    Send a batch of messages and files concurrently.
+
+    - **items**: list of `/send-message` and `/sendFile` request bodies
+
+    Results are streamed as NDJSON, one line per item in completion order
+    (`index` refers to the position in `items`), followed by a summary line.
+    """
+    return StreamingResponse(send_bulk(request.items), media_type="application/x-ndjson")
 
     
 @app.get("/", summary="Health check", description="Check if the API is running")
@@ -47,19 +241,74 @@ async def health_check():
         "status": "ok",
         "service": "WhatsApp Messaging API",
         "version": "1.0.0",
-        "webhook_enabled": True
+        "webhook_enabled": True,
+        "polling_enabled": settings.notifications_polling_enabled
     } 
 
 
+@app.get("/instances", summary="Green API instances", description="Health and traffic of the Green API instance pool")
+async def instances():
+    """
+    Per-instance health, send counters and inbound (webhook) counters.
+    """
+    return {"instances": instance_pool.stats(), "unknown_inbound": instance_pool.unknown_inbound}
+
+
+@app.get("/profile-cache/stats", summary="Profile cache statistics", description="Hit rate and size of the getProfile cache")
+async def profile_cache_stats():
+    """
+    Profile cache counters for tuning its size and TTLs.
+    """
+    return profile_cache.stats()
+
+
+@app.get("/ai-backend/stats", summary="AI backend client state", description="Circuit breaker state and adaptive concurrency limits")
+async def ai_backend_stats():
+    """
+    Circuit breaker state and the current concurrency limit of every AI backend route.
+    """
+    return ai_backend.stats()
+
+
+@app.get("/journal/stats", summary="Journal statistics", description="Records written and dropped by the traffic journal")
+async def journal_stats():
+    """
+    Journal counters; `dropped` grows when the disk cannot keep up.
+    """
+    return journal.stats()
+
+
+@app.get("/metrics", summary="Prometheus metrics", description="Upstream latency, errors and queue gauges in Prometheus text format")
+async def metrics():
+    """
+    Latency histograms and error counts per Green API method and AI backend
+    route, notification rate by `typeWebhook` and in-flight gauges.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.delete("/resetConversation", summary="Reset conversation", description="Reset conversation for a client")
 async def reset_conversation(request: ResetConversationRequest):
     """
     Reset conversation for a client
     """
-    requests.delete('http://51.250.42.45:2025/ai/resetConversation', json=request.model_dump())
-    requests.post('http://51.250.42.45:2025/ai/initConversation', json=request.model_dump())
+    await reset_client_conversation(request.client_phone)
 
     return {
         "status": "ok",
         "message": "Conversation reset successfully"
-    }
\ No newline at end of file
+    }
+
+
+@app.post("/resetConversations", summary="Reset many conversations", response_description="NDJSON stream of per-phone results")
+async def reset_conversations(request: BulkResetConversationRequest):
+    """
+    Reset conversations of many clients, e.g. after a prompt change.
+
+    - **client_phones**: phones to reset
+
+    Phones are reset concurrently (`BULK_RESET_CONCURRENCY`), each with
+    `resetConversation` before `initConversation`. Results are streamed as
+    NDJSON in completion order, followed by a summary line.
+    """
+    return StreamingResponse(reset_bulk(request.client_phones), media_type="application/x-ndjson")
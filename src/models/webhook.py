@@ -2,8 +2,8 @@
 Pydantic models for Green API webhook incoming messages.
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, Any, Dict, Literal, Optional, Union, get_args
 
 
 class TextMessageData(BaseModel):
@@ -51,5 +51,152 @@ class GreenAPIWebhook(BaseModel):
     body: WebhookBody = Field(..., description="Main webhook data")
 
 
+# --- Models for the webhook fast path (see src/services/webhook_parser.py) ---
+#
+# Only incoming message notifications are validated in full. They are kept
+# lenient about envelope fields (instanceData, timestamp) that hand-written
+# test requests often omit.
 
 
+class ExtendedTextMessageData(BaseModel):
+    """Text with a link preview, or a reply to another message."""
+    text: str = Field("", description="The text content of the message")
+    description: Optional[str] = None
+    title: Optional[str] = None
+    stanzaId: Optional[str] = Field(None, description="Id of the quoted message")
+    participant: Optional[str] = None
+
+
+class FileMessageData(BaseModel):
+    """Image, video, document or audio attachment."""
+    downloadUrl: Optional[str] = Field(None, description="Link to download the file")
+    caption: str = Field("", description="File caption")
+    fileName: Optional[str] = None
+    mimeType: Optional[str] = None
+
+
+class LocationMessageData(BaseModel):
+    nameLocation: Optional[str] = None
+    address: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class ContactMessageData(BaseModel):
+    displayName: Optional[str] = None
+    vcard: Optional[str] = None
+
+
+class TextMessage(BaseModel):
+    typeMessage: Literal["textMessage"]
+    textMessageData: TextMessageData
+
+    @property
+    def text(self) -> str:
+        return self.textMessageData.textMessage
+
+
+class ExtendedTextMessage(BaseModel):
+    typeMessage: Literal["extendedTextMessage", "quotedMessage"]
+    extendedTextMessageData: ExtendedTextMessageData
+
+    @property
+    def text(self) -> str:
+        return self.extendedTextMessageData.text
+
+
+class FileMessage(BaseModel):
+    typeMessage: Literal["imageMessage", "videoMessage", "documentMessage", "audioMessage"]
+    fileMessageData: FileMessageData
+
+    @property
+    def text(self) -> str:
+        return self.fileMessageData.caption
+
+
+class LocationMessage(BaseModel):
+    typeMessage: Literal["locationMessage"]
+    locationMessageData: LocationMessageData
+
+    @property
+    def text(self) -> str:
+        return ""
+
+
+class ContactMessage(BaseModel):
+    typeMessage: Literal["contactMessage"]
+    contactMessageData: ContactMessageData
+
+    @property
+    def text(self) -> str:
+        return ""
+
+
+# Tagged by typeMessage, which pydantic reads without a Python call
+KnownMessage = Annotated[
+    Union[TextMessage, ExtendedTextMessage, FileMessage, LocationMessage, ContactMessage],
+    Field(discriminator="typeMessage"),
+]
+
+KNOWN_MESSAGE_TYPES = frozenset(
+    type_message
+    for model in (TextMessage, ExtendedTextMessage, FileMessage, LocationMessage, ContactMessage)
+    for type_message in get_args(model.model_fields["typeMessage"].annotation)
+)
+
+
+class OtherMessage(BaseModel):
+    """Any message type without a dedicated model (stickers, polls, reactions...)."""
+    typeMessage: str = ""
+    textMessageData: Optional[TextMessageData] = None
+
+    @field_validator("typeMessage")
+    @classmethod
+    def _not_known(cls, value: str) -> str:
+        # A malformed known message is an error, not an "other" message
+        if value in KNOWN_MESSAGE_TYPES:
+            raise ValueError(f"invalid {value}")
+        return value
+
+    @property
+    def text(self) -> str:
+        return self.textMessageData.textMessage if self.textMessageData else ""
+
+
+IncomingMessageData = Annotated[Union[KnownMessage, OtherMessage], Field(union_mode="left_to_right")]
+
+
+class IncomingSenderData(BaseModel):
+    """Sender of an incoming message."""
+    sender: str = Field(..., description="Sender phone number with @c.us suffix")
+    chatId: Optional[str] = None
+    senderName: Optional[str] = None
+
+
+class IncomingMessageWebhook(BaseModel):
+    """`incomingMessageReceived` webhook body."""
+    typeWebhook: Literal["incomingMessageReceived"]
+    instanceData: Optional[InstanceData] = None
+    timestamp: Optional[int] = None
+    idMessage: Optional[str] = None
+    senderData: IncomingSenderData
+    messageData: IncomingMessageData
+
+    @property
+    def phone_number(self) -> str:
+        phone_number = self.senderData.sender.replace("@c.us", "")
+        if not phone_number.startswith("+"):
+            phone_number = f"+{phone_number}"
+        return phone_number
+
+
+class OutgoingMessageStatusWebhook(BaseModel):
+    """`outgoingMessageStatus` webhook body: a status change of a message we sent."""
+    typeWebhook: Literal["outgoingMessageStatus"]
+    instanceData: Optional[InstanceData] = None
+    timestamp: Optional[int] = None
+    idMessage: str = Field(..., description="Id returned by the send method")
+    status: str = Field(..., description="sent, delivered, read, failed, noAccount, notInGroup, yellowCard...")
+    chatId: Optional[str] = None
+    description: Optional[str] = Field(None, description="Reason of a failed status")
+    sendByApi: Optional[bool] = None
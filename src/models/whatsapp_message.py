@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, Field, field_validator
-from typing import Optional, List
+from typing import Literal, Optional, List, Union
 import re
 
 class WhatsAppMessageRequest(BaseModel):
@@ -19,6 +19,7 @@ class WhatsAppFileRequest(BaseModel):
     file_url: HttpUrl = Field(..., description="List of image URLs to send.")
     caption: Optional[str] = Field(None, description="Optional caption for the images.")
     extension: str = Field(default='png', description="File extension" )
+    mode: Literal['url', 'upload'] = Field(default='url', description="`url`: Green API downloads file_url itself (sendFileByUrl); `upload`: the file is streamed through this service (sendFileByUpload) and uploads are cached by content.")
     
     @field_validator('recipient')
     @classmethod
@@ -30,3 +31,47 @@ class WhatsAppFileRequest(BaseModel):
 class ResetConversationRequest(BaseModel):
     client_phone: str = Field(..., description="The phone number of the client in international format, e.g., +1234567890.")
 
+
+class BulkResetConversationRequest(BaseModel):
+    client_phones: List[str] = Field(..., min_length=1, description="Phone numbers whose conversations should be reset.")
+
+
+class MessageStatusRequest(BaseModel):
+    id_messages: List[str] = Field(..., min_length=1, max_length=10000, description="`idMessage` values returned by the send endpoints.")
+
+
+class BulkSendRequest(BaseModel):
+    items: List[Union[WhatsAppMessageRequest, WhatsAppFileRequest]] = Field(..., min_length=1, description="Messages (with `message`) and files (with `file_url`) to send.")
+
+
+class CompoundTextPart(BaseModel):
+    type: Literal['text'] = Field(..., description="`text`")
+    text: str = Field(..., min_length=1, description="Text to send; longer text is split on sentence boundaries into several messages.")
+
+    @field_validator('text')
+    @classmethod
+    def validate_text(cls, v):
+        if not v.strip():
+            raise ValueError('Text must not be blank')
+        return v
+
+
+class CompoundFilePart(BaseModel):
+    type: Literal['file'] = Field(..., description="`file`")
+    file_url: HttpUrl = Field(..., description="URL of the file to send.")
+    caption: Optional[str] = Field(None, description="Optional caption for the file.")
+    extension: str = Field(default='png', description="File extension")
+    mode: Literal['url', 'upload'] = Field(default='url', description="As in `/sendFile`; `upload` files are downloaded and uploaded while the earlier parts are being sent.")
+
+
+class CompoundSendRequest(BaseModel):
+    recipient: str = Field(..., description="The phone number of the recipient in international format, e.g., +1234567890.")
+    parts: List[Union[CompoundTextPart, CompoundFilePart]] = Field(..., min_length=1, max_length=100, description="Texts and files, sent in this order.")
+    stop_on_error: bool = Field(default=True, description="Skip the remaining parts once one fails, so the recipient never gets a reply with a gap.")
+
+    @field_validator('recipient')
+    @classmethod
+    def validate_recipient(cls, v):
+        if not v.startswith('+') or not v[1:].isdigit():
+            raise ValueError('Recipient must be in international format, e.g., +1234567890')
+        return v
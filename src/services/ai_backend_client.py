@@ -0,0 +1,176 @@
+"""
+Async client for the AI backend (profiles and conversations).
+
+Every route has its own timeout and an adaptive concurrency limit that
+shrinks when the backend slows down, and all routes share a circuit
+breaker. During a backend incident calls are shed quickly with
+AIBackendUnavailableError instead of piling up behind a slow upstream.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.config.settings import settings
+from src.utils.adaptive_limit import AdaptiveLimiter, LimitExceededError
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = registry.histogram(
+    "ai_backend_request_duration_seconds", "AI backend call latency by route.", ("route",))
+REQUEST_ERRORS = registry.counter(
+    "ai_backend_request_errors_total", "Failed AI backend calls by route and HTTP status or error type.",
+    ("route", "reason"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "ai_backend_requests_in_flight", "AI backend calls currently in progress.", ("route",))
+
+
+class AIBackendUnavailableError(Exception):
+    """The call was shed by the circuit breaker or the concurrency limit."""
+
+
+class AIBackendClient:
+    """
+    Pooled async client for the ``/ai/*`` routes of the AI backend.
+    """
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or settings.ai_backend_url).rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(settings.ai_backend_breaker_failures, settings.ai_backend_breaker_open_seconds)
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.base_url, timeout=settings.ai_backend_timeout)
+
+    async def start(self) -> None:
+        """Open the connection pool (called from the app lifespan)."""
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def aclose(self) -> None:
+        """Close the connection pool (called from the app lifespan)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def limiter(self, route: str) -> AdaptiveLimiter:
+        limiter = self.limiters.get(route)
+        if limiter is None:
+            limiter = self.limiters[route] = AdaptiveLimiter(
+                initial=settings.ai_backend_initial_concurrency,
+                min_limit=settings.ai_backend_min_concurrency,
+                max_limit=settings.ai_backend_max_concurrency,
+                tolerance=settings.ai_backend_latency_tolerance,
+                max_waiters=settings.ai_backend_max_waiters,
+                max_wait=settings.ai_backend_max_wait,
+            )
+        return limiter
+
+    async def call(self, http_method: str, route: str, payload: dict) -> Any:
+        """
+        Call an ``/ai/{route}`` endpoint and return the decoded JSON body.
+
+        Raises AIBackendUnavailableError when the call is shed,
+        httpx.HTTPStatusError for non-2xx responses and httpx.RequestError
+        (httpx.TimeoutException past the route timeout) for transport failures.
+        """
+        timeout = settings.ai_backend_route_timeouts.get(route, settings.ai_backend_timeout)
+        limiter = self.limiter(route)
+        try:
+            self.breaker.before_call()
+            try:
+                await limiter.acquire()
+            except BaseException:
+                self.breaker.record_ignored()
+                raise
+        except (CircuitOpenError, LimitExceededError) as e:
+            REQUEST_ERRORS.inc(route, type(e).__name__)
+            raise AIBackendUnavailableError(f"AI backend call {route} shed: {e}") from e
+
+        latency: Optional[float] = None
+        overloaded = False
+        REQUESTS_IN_FLIGHT.inc(route)
+        started = time.perf_counter()
+        try:
+            try:
+                # httpx timeouts apply per read; this one bounds the whole call
+                async with asyncio.timeout(timeout):
+                    response = await self.client.request(http_method, f"/ai/{route}", json=payload, timeout=timeout)
+            except TimeoutError:
+                raise httpx.TimeoutException(f"AI backend call {route} took longer than {timeout}s") from None
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            REQUEST_ERRORS.inc(route, str(e.response.status_code))
+            if e.response.status_code >= 500:
+                overloaded = True
+                self.breaker.record_failure()
+            else:
+                # The backend is up, it just did not like the request
+                self.breaker.record_success()
+            raise
+        except httpx.RequestError as e:
+            REQUEST_ERRORS.inc(route, type(e).__name__)
+            overloaded = True
+            self.breaker.record_failure()
+            raise
+        except BaseException as e:
+            REQUEST_ERRORS.inc(route, type(e).__name__)
+            self.breaker.record_ignored()
+            raise
+        else:
+            latency = time.perf_counter() - started
+            self.breaker.record_success()
+        finally:
+            limiter.release(latency, overloaded)
+            REQUEST_DURATION.observe(time.perf_counter() - started, route)
+            REQUESTS_IN_FLIGHT.dec(route)
+        if not response.content:
+            return None
+        return response.json()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "opened": self.breaker.opened,
+                "rejected": self.breaker.rejected,
+            },
+            "routes": {
+                route: {
+                    "limit": round(limiter.limit, 2),
+                    "in_flight": limiter.in_flight,
+                    "waiting": limiter.waiting(),
+                    "shed": limiter.shed,
+                    "baseline_latency_s": round(limiter.baseline, 4) if limiter.baseline is not None else None,
+                }
+                for route, limiter in self.limiters.items()
+            },
+        }
+
+    async def get_profile(self, client_phone: str) -> Any:
+        return await self.call("GET", "getProfile", {"client_phone": client_phone})
+
+    async def process_conversation(self, client_phone: str, message: str) -> Any:
+        return await self.call("POST", "processConversation", {"client_phone": client_phone, "message": message})
+
+    async def reset_conversation(self, client_phone: str) -> Any:
+        return await self.call("DELETE", "resetConversation", {"client_phone": client_phone})
+
+    async def init_conversation(self, client_phone: str) -> Any:
+        return await self.call("POST", "initConversation", {"client_phone": client_phone})
+
+
+ai_backend = AIBackendClient()
@@ -0,0 +1,86 @@
+"""
+Concurrent bulk operations with per-item results streamed as NDJSON.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar, Union
+
+import orjson
+from fastapi import HTTPException
+
+from src.config.settings import settings
+from src.models.whatsapp_message import WhatsAppMessageRequest, WhatsAppFileRequest
+from src.services.whatsapp_service import send_whatsapp_message, send_whatsapp_file
+
+logger = logging.getLogger(__name__)
+
+BulkItem = Union[WhatsAppMessageRequest, WhatsAppFileRequest]
+
+T = TypeVar("T")
+
+
+async def run_bulk(
+    items: Sequence[T],
+    handle: Callable[[int, T], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    ok_key: str = "ok",
+) -> AsyncIterator[bytes]:
+    """
+    Run ``handle(index, item)`` with at most ``concurrency`` items in flight
+    and yield one NDJSON line per result as soon as it completes, followed
+    by a summary line. ``handle`` reports failures with ``status != "ok"``
+    instead of raising.
+    """
+    concurrency = max(1, min(concurrency, len(items)))
+    pending = iter(enumerate(items))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, item in pending:
+            await results.put(await handle(index, item))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    ok = failed = 0
+    try:
+        for _ in range(len(items)):
+            result = await results.get()
+            if result["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+            yield orjson.dumps(result) + b"\n"
+        yield orjson.dumps({"done": True, "total": len(items), ok_key: ok, "failed": failed}) + b"\n"
+    finally:
+        # Stop if the client went away mid-batch
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def send_item(index: int, item: BulkItem) -> Dict:
+    """Send one bulk item and describe the outcome instead of raising."""
+    result: Dict = {"index": index, "recipient": item.recipient}
+    try:
+        if isinstance(item, WhatsAppFileRequest):
+            response = await send_whatsapp_file(item)
+        else:
+            response = await send_whatsapp_message(item)
+    except HTTPException as exc:
+        result.update(status="error", status_code=exc.status_code, detail=exc.detail)
+    except Exception as exc:
+        logger.error(f"Unexpected error in bulk item {index}: {exc}", exc_info=True)
+        result.update(status="error", status_code=500, detail=str(exc))
+    else:
+        result.update(status="ok", response=response)
+    return result
+
+
+def send_bulk(items: List[BulkItem], concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Send items with at most ``concurrency`` requests in flight and yield one
+    NDJSON line per item as soon as it completes, followed by a summary line.
+
+    Pacing against Green API limits is done by the client's send token bucket.
+    """
+    return run_bulk(items, send_item, concurrency or settings.bulk_send_concurrency, ok_key="sent")
@@ -0,0 +1,166 @@
+"""
+Multi-part replies: texts and files sent to one recipient in order.
+
+Long texts are split on paragraph, then sentence, then word boundaries
+into messages of at most ``compound_max_text_length`` characters. Parts
+are sent one after another, each once the previous one was accepted by
+Green API, so they arrive in order. Meanwhile files in `upload` mode are
+downloaded and stored with ``uploadFile`` (``compound_prefetch_concurrency``
+at a time), and their turn is a plain ``sendFileByUrl``.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from src.config.settings import settings
+from src.models.whatsapp_message import (
+    CompoundSendRequest, CompoundTextPart, WhatsAppFileRequest, WhatsAppMessageRequest,
+)
+from src.services.media_relay import media_relay
+from src.services.whatsapp_service import send_whatsapp_file, send_whatsapp_message
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COMPOUND_MESSAGES = registry.counter(
+    "compound_messages_total", "Messages of /send-compound replies by outcome (ok, error, skipped).",
+    ("status",))
+
+# Preferred split points, best first; a piece still too long is split at the next level
+_BOUNDARIES = [
+    re.compile(r"\n\s*\n"),
+    re.compile(r"(?<=[.!?…])\s+|\n"),
+    re.compile(r"\s+"),
+]
+
+
+def split_text(text: str, max_length: Optional[int] = None) -> List[str]:
+    """
+    Split ``text`` into chunks of at most ``max_length`` characters,
+    breaking between paragraphs or sentences where possible and inside
+    words only as a last resort.
+    """
+    return _split(text, max_length or settings.compound_max_text_length, 0)
+
+
+def _split(text: str, max_length: int, level: int) -> List[str]:
+    text = text.strip()
+    if len(text) <= max_length:
+        return [text] if text else []
+    if level == len(_BOUNDARIES):
+        return [text[i:i + max_length] for i in range(0, len(text), max_length)]
+
+    # Each piece keeps the separator that follows it
+    pieces = []
+    position = 0
+    for match in _BOUNDARIES[level].finditer(text):
+        pieces.append(text[position:match.end()])
+        position = match.end()
+    pieces.append(text[position:])
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if len((current + piece).rstrip()) <= max_length:
+            current += piece
+            continue
+        if current.strip():
+            chunks.append(current.strip())
+        current = ""
+        if len(piece.strip()) > max_length:
+            chunks.extend(_split(piece, max_length, level + 1))
+        else:
+            current = piece
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+Step = Tuple[int, Union[WhatsAppMessageRequest, WhatsAppFileRequest]]
+
+
+def _steps(request: CompoundSendRequest) -> List[Step]:
+    """One (part index, send request) per message, texts already split."""
+    steps: List[Step] = []
+    for index, part in enumerate(request.parts):
+        if isinstance(part, CompoundTextPart):
+            for chunk in split_text(part.text):
+                steps.append((index, WhatsAppMessageRequest(recipient=request.recipient, message=chunk)))
+        else:
+            steps.append((index, WhatsAppFileRequest(
+                recipient=request.recipient,
+                file_url=part.file_url,
+                caption=part.caption,
+                extension=part.extension,
+                mode=part.mode,
+            )))
+    return steps
+
+
+async def send_compound(request: CompoundSendRequest) -> Dict:
+    """
+    Send the parts of ``request`` in order and describe the outcome of
+    every message instead of raising. ``status`` is `ok` when all of them
+    were sent.
+    """
+    steps = _steps(request)
+    slots = asyncio.Semaphore(settings.compound_prefetch_concurrency)
+
+    async def prefetch(item: WhatsAppFileRequest) -> str:
+        async with slots:
+            return await media_relay.prepare(item.recipient, str(item.file_url), "file." + item.extension)
+
+    # Started in part order, so the next file is usually ready first
+    prefetches: Dict[int, asyncio.Task] = {
+        position: asyncio.create_task(prefetch(item))
+        for position, (_, item) in enumerate(steps)
+        if isinstance(item, WhatsAppFileRequest) and item.mode == "upload"
+    }
+
+    results: List[Dict] = []
+    failed = False
+    try:
+        for position, (index, item) in enumerate(steps):
+            result: Dict = {"index": index, "type": "file" if isinstance(item, WhatsAppFileRequest) else "text"}
+            if failed and request.stop_on_error:
+                result.update(status="skipped")
+                results.append(result)
+                continue
+            try:
+                if isinstance(item, WhatsAppFileRequest):
+                    response = await send_whatsapp_file(item, prefetches.get(position))
+                else:
+                    response = await send_whatsapp_message(item)
+            except HTTPException as exc:
+                failed = True
+                result.update(status="error", status_code=exc.status_code, detail=exc.detail)
+            except Exception as exc:
+                logger.error(f"Unexpected error in compound part {index}: {exc}", exc_info=True)
+                failed = True
+                result.update(status="error", status_code=500, detail=str(exc))
+            else:
+                result.update(status="ok", response=response)
+            results.append(result)
+    finally:
+        # Files of skipped parts (or of a cancelled request) are not needed any more
+        for task in prefetches.values():
+            task.cancel()
+        await asyncio.gather(*prefetches.values(), return_exceptions=True)
+
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("ok", "error", "skipped")}
+    for status, count in counts.items():
+        if count:
+            COMPOUND_MESSAGES.inc(status, amount=count)
+    return {
+        "recipient": request.recipient,
+        "status": "ok" if not failed else ("partial" if counts["ok"] else "error"),
+        "messages": len(results),
+        "sent": counts["ok"],
+        "failed": counts["error"],
+        "skipped": counts["skipped"],
+        "results": results,
+    }
@@ -0,0 +1,70 @@
+"""
+Forwarding of incoming WhatsApp messages to the AI backend.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
+from src.config.settings import settings
+from src.services.ai_backend_client import AIBackendUnavailableError, ai_backend
+from src.services.incoming_pipeline import IncomingMessage, IncomingPipeline
+from src.services.profile_cache import profile_cache
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+# phone -> held while a worker process talks to the AI backend about that chat
+_chat_leases = state_backend.kv("chat-lease", settings.webhook_queue_size, settings.chat_lease_ttl)
+
+
+@asynccontextmanager
+async def chat_lease(phone_number: str) -> AsyncIterator[None]:
+    """
+    Process one chat in one worker at a time.
+
+    Within a worker the pipeline lanes already serialize a chat; the lease
+    extends that to messages of the same chat that reached other workers.
+    """
+    delay = 0.05
+    while not await _chat_leases.add(phone_number):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    try:
+        yield
+    finally:
+        await _chat_leases.delete(phone_number)
+
+
+def merge_messages(messages: List[IncomingMessage]) -> str:
+    """
+    Join a burst of messages from one sender into a single text, oldest first.
+    """
+    if len(messages) == 1:
+        return messages[0].text
+    return "\n".join(m.text for m in messages if m.text)
+
+
+async def process_incoming_messages(phone_number: str, messages: List[IncomingMessage]) -> None:
+    """
+    Forward a burst of messages to the AI backend if the sender has a profile.
+
+    While the AI backend is shedding load the burst is dropped with a
+    warning rather than retried, so a backend incident cannot build up a
+    backlog here.
+    """
+    try:
+        profile = await profile_cache.get(phone_number)
+
+        if profile: # если профиль есть, то обрабатываем сообщение
+            message_text = merge_messages(messages)
+            print(f"📞 Номер телефона: {phone_number}")
+            print(f"💬 Сообщение: {message_text}")
+            async with chat_lease(phone_number):
+                await ai_backend.process_conversation(phone_number, message_text)
+    except AIBackendUnavailableError as e:
+        logger.warning(f"Dropped {len(messages)} message(s) from {phone_number}: {e}")
+
+
+incoming_pipeline = IncomingPipeline(process_incoming_messages)
@@ -0,0 +1,115 @@
+"""
+Index of delivery statuses of sent messages, fed by ``outgoingMessageStatus``
+webhooks.
+
+Every message sent through this service is registered under the
+``idMessage`` Green API returned, and status notifications move it
+forward (sent -> delivered -> read, or a failure). Lookups are answered
+from the index, in batches, without calling Green API. Entries expire
+after ``delivery_status_ttl``; the index lives in the state backend, so
+all workers see the same statuses.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import settings
+from src.models.webhook import OutgoingMessageStatusWebhook
+from src.services.state_backend import state_backend
+
+# Notifications may arrive out of order; a status never replaces a later one
+STATUS_RANK = {
+    "accepted": 0,  # our own: Green API accepted the send, no notification yet
+    "pending": 1,
+    "sent": 1,
+    "delivered": 2,
+    "read": 3,
+    "played": 3,
+    "failed": 4,
+    "noAccount": 4,
+    "notInGroup": 4,
+    "yellowCard": 4,
+}
+
+
+def _rank(status: Optional[str]) -> int:
+    return STATUS_RANK.get(status, 1)
+
+
+def _phone(chat_id: Optional[str]) -> Optional[str]:
+    if not chat_id or not chat_id.endswith("@c.us"):
+        return None
+    return "+" + chat_id[:-len("@c.us")].lstrip("+")
+
+
+class DeliveryStatusIndex:
+    """
+    idMessage -> latest known status, bounded by size (in memory) and TTL.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self._store = state_backend.kv(
+            "delivery-status",
+            max_size or settings.delivery_status_size,
+            settings.delivery_status_ttl if ttl is None else ttl,
+        )
+        self.updates = 0
+        self.out_of_order = 0
+        self.lookups = 0
+        self.found = 0
+
+    async def note_sent(self, id_message: Optional[str], recipient: str) -> None:
+        """Register a message Green API accepted for sending."""
+        if not id_message:
+            return
+        # add(): a status notification may already have overtaken the send response
+        await self._store.add(id_message, {
+            "status": "accepted",
+            "phone_number": recipient,
+            "timestamp": None,
+            "updated_at": time.time(),
+        })
+
+    async def update(self, notification: OutgoingMessageStatusWebhook) -> bool:
+        """Apply a status notification. Returns False if a later status is already known."""
+        def apply(current: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            # Runs atomically in the store, so workers racing on one message cannot move it back
+            if current is not None and _rank(current["status"]) > _rank(notification.status):
+                return None
+            entry = {
+                "status": notification.status,
+                "phone_number": _phone(notification.chatId) or (current or {}).get("phone_number"),
+                "timestamp": notification.timestamp,
+                "updated_at": time.time(),
+            }
+            if notification.description:
+                entry["description"] = notification.description
+            if notification.instanceData:
+                entry["id_instance"] = str(notification.instanceData.idInstance)
+            return entry
+
+        if not await self._store.update(notification.idMessage, apply):
+            self.out_of_order += 1
+            return False
+        self.updates += 1
+        return True
+
+    async def get_many(self, id_messages: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Status of every id, None for ids that are unknown or expired."""
+        ids = list(dict.fromkeys(id_messages))
+        found = await self._store.get_many(ids)
+        self.lookups += len(ids)
+        self.found += len(found)
+        return {id_message: found.get(id_message) for id_message in ids}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._store.describe(),
+            "updates": self.updates,
+            "out_of_order": self.out_of_order,
+            "lookups": self.lookups,
+            "found": self.found,
+        }
+
+
+delivery_status = DeliveryStatusIndex()
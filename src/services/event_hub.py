@@ -0,0 +1,212 @@
+"""
+Fan-out of incoming Green API events to live subscribers (WebSocket / SSE).
+
+Ingestion publishes without ever waiting: every subscriber has its own
+bounded buffer, and a subscriber whose buffer is full is disconnected
+instead of slowing the webhook down or holding memory for it. Subscribers
+choose what they receive with filters on phone, typeWebhook and
+typeMessage.
+
+Events are normalised dicts:
+    {"seq", "type", "id_instance", "timestamp", "id_message",
+     "phone_number", ...} plus "type_message", "text" and "sender_name"
+    for incoming messages, "status" and "description" for delivery
+    statuses, or the original notification under "body" for other types.
+
+The hub is per process: with several workers a subscriber sees the
+events ingested by the worker it is connected to.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Set
+
+from src.config.settings import settings
+from src.models.webhook import IncomingMessageWebhook, OutgoingMessageStatusWebhook
+
+logger = logging.getLogger(__name__)
+
+
+class TooManySubscribersError(Exception):
+    """Raised by subscribe() when ``event_stream_max_subscribers`` is reached."""
+
+
+def _normalise_phone(chat_id: Optional[str]) -> Optional[str]:
+    if not chat_id or not chat_id.endswith("@c.us"):
+        return None
+    phone_number = chat_id[:-len("@c.us")]
+    return phone_number if phone_number.startswith("+") else f"+{phone_number}"
+
+
+def message_event(notification: IncomingMessageWebhook) -> Dict[str, Any]:
+    """Event for a validated incoming message."""
+    message = notification.messageData
+    return {
+        "type": notification.typeWebhook,
+        "id_instance": str(notification.instanceData.idInstance) if notification.instanceData else None,
+        "timestamp": notification.timestamp,
+        "id_message": notification.idMessage,
+        "phone_number": notification.phone_number,
+        "sender_name": notification.senderData.senderName,
+        "type_message": message.typeMessage,
+        "text": message.text,
+    }
+
+
+def status_event(notification: OutgoingMessageStatusWebhook) -> Dict[str, Any]:
+    """Event for a delivery status of a sent message."""
+    return {
+        "type": notification.typeWebhook,
+        "id_instance": str(notification.instanceData.idInstance) if notification.instanceData else None,
+        "timestamp": notification.timestamp,
+        "id_message": notification.idMessage,
+        "phone_number": _normalise_phone(notification.chatId),
+        "status": notification.status,
+        "description": notification.description,
+    }
+
+
+def notification_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Event for any other notification type; the body is passed on as is."""
+    instance = data.get("instanceData")
+    sender = data.get("senderData")
+    chat_id = data.get("chatId")
+    if isinstance(sender, dict):
+        chat_id = sender.get("sender") or sender.get("chatId")
+    return {
+        "type": data.get("typeWebhook"),
+        "id_instance": str(instance.get("idInstance")) if isinstance(instance, dict) else None,
+        "timestamp": data.get("timestamp"),
+        "id_message": data.get("idMessage"),
+        "phone_number": _normalise_phone(chat_id if isinstance(chat_id, str) else None),
+        "body": data,
+    }
+
+
+class Subscriber:
+    """
+    One connected consumer: its filters and a bounded event buffer.
+
+    Empty filters match everything.
+    """
+
+    def __init__(
+        self,
+        phones: Iterable[str] = (),
+        types: Iterable[str] = (),
+        message_types: Iterable[str] = (),
+        buffer_size: Optional[int] = None,
+    ):
+        self.phones: Set[str] = {"+" + p.lstrip("+") for p in phones if p}
+        self.types: Set[str] = set(types)
+        self.message_types: Set[str] = set(message_types)
+        self.buffer_size = buffer_size or settings.event_stream_buffer
+        self.delivered = 0
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+
+    def wants_type(self, type_webhook: str) -> bool:
+        return not self.types or type_webhook in self.types
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if not self.wants_type(event["type"]):
+            return False
+        if self.phones and event.get("phone_number") not in self.phones:
+            return False
+        if self.message_types and event.get("type_message") not in self.message_types:
+            return False
+        return True
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Buffer an event. Returns False if the buffer is full."""
+        if len(self._events) >= self.buffer_size:
+            return False
+        self._events.append(event)
+        self._ready.set()
+        return True
+
+    def close(self, reason: str) -> None:
+        self.closed = True
+        self.close_reason = reason
+        self._events.clear()
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event. Returns None on timeout or once the
+        subscriber is closed (check ``closed`` to tell them apart).
+        """
+        while not self._events:
+            if self.closed:
+                return None
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.delivered += 1
+        return self._events.popleft()
+
+
+class EventHub:
+    """
+    Registry of subscribers. ``publish`` is synchronous and O(subscribers).
+    """
+
+    def __init__(self, max_subscribers: Optional[int] = None):
+        self.max_subscribers = max_subscribers or settings.event_stream_max_subscribers
+        self.published = 0
+        self.dropped_subscribers = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise TooManySubscribersError(f"Event stream is full ({self.max_subscribers} subscribers)")
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def wants(self, type_webhook: Optional[str]) -> bool:
+        """True if some subscriber accepts this type (lets callers skip building the event)."""
+        return type_webhook is not None and any(s.wants_type(type_webhook) for s in self._subscribers)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        if not self._subscribers:
+            return
+        self._seq += 1
+        event["seq"] = self._seq
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if not subscriber.matches(event):
+                continue
+            if not subscriber.offer(event):
+                # A consumer that cannot keep up is cut off rather than slowing ingestion down
+                logger.warning(f"Dropping slow event stream subscriber ({subscriber.buffer_size} events buffered)")
+                self.dropped_subscribers += 1
+                self._subscribers.discard(subscriber)
+                subscriber.close("slow consumer")
+
+    async def aclose(self) -> None:
+        """Disconnect everyone on shutdown."""
+        for subscriber in list(self._subscribers):
+            subscriber.close("shutdown")
+        self._subscribers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+event_hub = EventHub()
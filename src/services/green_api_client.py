@@ -0,0 +1,206 @@
+"""
+Shared async client for Green API.
+
+A single pooled httpx.AsyncClient is created on application startup and
+closed on shutdown (see the lifespan in src/main.py), so every request
+reuses warm keep-alive connections instead of paying a new TCP/TLS
+handshake per call. The pool is shared by all configured instances.
+"""
+
+import importlib.util
+import logging
+import time
+from typing import Any, AsyncIterable, Dict, Optional
+
+import httpx
+
+from src.config.settings import settings
+from src.services.state_backend import state_backend
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = registry.histogram(
+    "green_api_request_duration_seconds", "Green API call latency by method.", ("instance", "method"))
+REQUEST_ERRORS = registry.counter(
+    "green_api_request_errors_total", "Failed Green API calls by method and HTTP status or error type.",
+    ("instance", "method", "reason"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "green_api_requests_in_flight", "Green API calls currently in progress.", ("instance", "method"))
+
+
+class _ConnectionPool:
+    """
+    One httpx.AsyncClient shared by every GreenApiClient, so all instances
+    reuse the same warm connections to the Green API hosts.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = settings.green_api_http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("GREEN_API_HTTP2 is enabled but the `h2` package is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.green_api_max_connections,
+                max_keepalive_connections=settings.green_api_max_keepalive_connections,
+                keepalive_expiry=settings.green_api_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(settings.green_api_timeout, connect=settings.green_api_connect_timeout),
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Lazily open the pool for code paths running outside the lifespan (scripts, tests)
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    @client.setter
+    def client(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+
+
+connection_pool = _ConnectionPool()
+
+
+class GreenApiClient:
+    """
+    Thin wrapper around Green API REST methods of one instance.
+
+    Every method is addressed as ``{host}/waInstance{id}/{method}/{token}``;
+    upload methods go to ``media_url`` instead of ``api_url``.
+    """
+
+    def __init__(
+        self,
+        id_instance: Optional[str] = None,
+        api_token_instance: Optional[str] = None,
+        api_url: Optional[str] = None,
+        media_url: Optional[str] = None,
+    ):
+        self.id_instance = str(id_instance or settings.id_instance)
+        self.api_token_instance = api_token_instance or settings.api_token_instance
+        self.api_url = (api_url or settings.api_url).rstrip("/")
+        self.media_url = (media_url or settings.media_url).rstrip("/")
+        # Green API limits sending per instance, so all send* calls (of all workers) share one bucket
+        self.send_limiter = state_backend.token_bucket(
+            f"green-api-send:{self.id_instance}", settings.green_api_send_rate, settings.green_api_send_burst)
+
+    def __repr__(self) -> str:
+        return f"GreenApiClient(id_instance={self.id_instance!r})"
+
+    async def start(self) -> None:
+        """Open the shared connection pool (called from the app lifespan)."""
+        await connection_pool.start()
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool (called from the app lifespan)."""
+        await connection_pool.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return connection_pool.client
+
+    def method_url(self, method: str, *path: Any, media: bool = False) -> str:
+        host = self.media_url if media else self.api_url
+        url = f"{host}/waInstance{self.id_instance}/{method}/{self.api_token_instance}"
+        if path:
+            url += "/" + "/".join(str(p) for p in path)
+        return url
+
+    async def call(
+        self,
+        method: str,
+        payload: Optional[Dict[str, Any]] = None,
+        *,
+        http_method: str = "POST",
+        path: tuple = (),
+        params: Optional[Dict[str, Any]] = None,
+        media: bool = False,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Call any Green API method and return the decoded JSON body.
+
+        Raises httpx.HTTPStatusError for non-2xx responses and
+        httpx.RequestError for transport failures.
+        """
+        url = self.method_url(method, *path, media=media)
+        request_kwargs: Dict[str, Any] = dict(kwargs)
+        if payload is not None:
+            request_kwargs["json"] = payload
+        if params is not None:
+            request_kwargs["params"] = params
+        if timeout is not None:
+            request_kwargs["timeout"] = timeout
+
+        labels = (self.id_instance, method)
+        REQUESTS_IN_FLIGHT.inc(*labels)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(http_method, url, **request_kwargs)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            REQUEST_ERRORS.inc(*labels, str(e.response.status_code))
+            raise
+        except Exception as e:
+            REQUEST_ERRORS.inc(*labels, type(e).__name__)
+            raise
+        finally:
+            REQUEST_DURATION.observe(time.perf_counter() - started, *labels)
+            REQUESTS_IN_FLIGHT.dec(*labels)
+        if not response.content:
+            return None
+        return response.json()
+
+    # Convenience wrappers for the methods used by the service
+
+    async def send_message(self, payload: Dict[str, Any]) -> Any:
+        await self.send_limiter.acquire()
+        return await self.call("sendMessage", payload)
+
+    async def send_file_by_url(self, payload: Dict[str, Any]) -> Any:
+        await self.send_limiter.acquire()
+        return await self.call("sendFileByUrl", payload)
+
+    async def send_file_by_upload(self, content: AsyncIterable[bytes], headers: Dict[str, str]) -> Any:
+        # Multipart body is streamed by the caller (see media_relay)
+        await self.send_limiter.acquire()
+        return await self.call("sendFileByUpload", content=content, headers=headers, media=True,
+                               timeout=settings.media_upload_timeout)
+
+    async def upload_file(self, content: AsyncIterable[bytes], headers: Dict[str, str]) -> Any:
+        # Stores the file and returns its urlFile; nothing is sent, so no send pacing
+        return await self.call("uploadFile", content=content, headers=headers, media=True,
+                               timeout=settings.media_upload_timeout)
+
+    async def receive_notification(self, receive_timeout: int = 5) -> Any:
+        # The HTTP timeout must outlive the long-poll window on the server side
+        return await self.call(
+            "receiveNotification",
+            http_method="GET",
+            params={"receiveTimeout": receive_timeout},
+            timeout=receive_timeout + settings.green_api_timeout,
+        )
+
+    async def delete_notification(self, receipt_id: int) -> Any:
+        return await self.call("deleteNotification", http_method="DELETE", path=(receipt_id,))
+
+
+green_api = GreenApiClient()
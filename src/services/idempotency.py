@@ -0,0 +1,173 @@
+"""
+``Idempotency-Key`` support for the send endpoints.
+
+A client that times out and retries with the same key must not make the
+customer receive the message twice:
+
+- a repeat while the first request is still being sent waits for it and
+  gets the same response (or error);
+- a repeat after a successful send gets the stored response, until
+  ``idempotency_ttl`` expires;
+- a repeat after a failed send is sent again, since nothing was stored
+  (an endpoint may choose to keep some failures, see ``keep``).
+
+Keys are scoped per endpoint and bound to the request body: reusing a key
+for a different request is rejected with 422. Requests are coalesced in
+one worker through a shared future and across workers through an
+in-progress marker in the state backend.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from src.config.settings import settings
+from src.services.state_backend import state_backend
+from src.utils.single_flight import SingleFlight
+
+# (status code, JSON body)
+Outcome = Tuple[int, Any]
+
+# Whether an outcome is stored and replayed, rather than forgotten so that a retry runs again
+KeepOutcome = Callable[[int, Any], bool]
+
+
+def _succeeded(status_code: int, body: Any) -> bool:
+    return 200 <= status_code < 300
+
+
+class IdempotencyConflictError(Exception):
+    """The key was already used for a different request."""
+
+
+def fingerprint(data: Any) -> str:
+    return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Outcomes of completed requests by key (bounded, TTL) plus the requests in flight.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 in_flight_ttl: Optional[float] = None):
+        self.ttl = settings.idempotency_ttl if ttl is None else ttl
+        self.in_flight_ttl = settings.idempotency_in_flight_ttl if in_flight_ttl is None else in_flight_ttl
+        self._store = state_backend.kv("idempotency", max_size or settings.idempotency_cache_size, self.ttl)
+        # key -> send in progress in this worker, tagged with its request fingerprint
+        self._inflight = SingleFlight()
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.conflicts = 0
+
+    async def run(self, key: str, request_fingerprint: str, call: Callable[[], Awaitable[Outcome]],
+                  keep: KeepOutcome = _succeeded) -> Tuple[Outcome, bool]:
+        """
+        Run ``call`` once per key. Returns the outcome and whether it is a replay.
+        Outcomes ``keep`` rejects (by default, non-2xx) are not stored.
+
+        Raises IdempotencyConflictError if the key belongs to a different request.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self._check(self._inflight.tag(key), request_fingerprint)
+            self.coalesced += 1
+            return await asyncio.shield(future), True
+
+        with self._inflight.lead(key, request_fingerprint,
+                                 cancelled=RuntimeError("Idempotent request was cancelled")) as future:
+            outcome = await self._claim_or_wait(key, request_fingerprint)
+            if outcome is not None:
+                replayed = True
+            else:
+                replayed = False
+                outcome = await self._execute(key, request_fingerprint, call, keep)
+            future.set_result(outcome)
+        return outcome, replayed
+
+    async def _claim_or_wait(self, key: str, request_fingerprint: str) -> Optional[Outcome]:
+        """
+        Return the stored outcome, waiting while another worker is sending
+        this key, or None once this worker owns the key.
+        """
+        delay = 0.05
+        waited = False
+        while True:
+            entry = await self._store.get(key)
+            if entry is None:
+                marker = {"state": "in_progress", "fingerprint": request_fingerprint}
+                # The marker expires by itself if the worker holding it dies
+                if await self._store.add(key, marker, ttl=self.in_flight_ttl):
+                    return None
+                continue
+            self._check(entry["fingerprint"], request_fingerprint)
+            if entry["state"] == "done":
+                self.replayed += 1
+                return entry["status_code"], entry["body"]
+            if not waited:
+                self.coalesced += 1
+                waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    async def _execute(self, key: str, request_fingerprint: str, call: Callable[[], Awaitable[Outcome]],
+                       keep: KeepOutcome) -> Outcome:
+        self.executed += 1
+        try:
+            status_code, body = await call()
+        except BaseException:
+            # Nothing was stored: a retry sends again
+            await self._store.delete(key)
+            raise
+        if keep(status_code, body):
+            await self._store.set(key, {
+                "state": "done",
+                "fingerprint": request_fingerprint,
+                "status_code": status_code,
+                "body": body,
+            })
+        else:
+            await self._store.delete(key)
+        return status_code, body
+
+    def _check(self, stored_fingerprint: str, request_fingerprint: str) -> None:
+        if stored_fingerprint != request_fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflictError("Idempotency-Key was already used for a different request")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._store.describe(),
+            "in_flight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "conflicts": self.conflicts,
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def idempotent_response(key: Optional[str], scope: str, request_data: Any,
+                              call: Callable[[], Awaitable[Outcome]],
+                              keep: KeepOutcome = _succeeded) -> JSONResponse:
+    """
+    Answer an endpoint call through the idempotency store when the client
+    sent an ``Idempotency-Key``; replayed responses carry ``Idempotent-Replayed: true``.
+    """
+    if not key:
+        status_code, body = await call()
+        return JSONResponse(status_code=status_code, content=body)
+    try:
+        (status_code, body), replayed = await idempotency_store.run(
+            f"{scope}:{key}", fingerprint([scope, request_data]), call, keep)
+    except IdempotencyConflictError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
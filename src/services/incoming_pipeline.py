@@ -0,0 +1,217 @@
+"""
+Bounded async pipeline between the webhook endpoint and the AI backend.
+
+The webhook only parses the notification and enqueues it; a fixed pool
+of worker tasks drains the queue and talks to the AI backend, so a slow
+LLM turn never blocks the event loop or the webhook acknowledgement.
+
+Messages are grouped into one lane per sender. A lane is handled by at
+most one worker at a time, which keeps the order of messages within a
+chat while different chats run in parallel. Messages from one sender
+that arrive within the debounce window are handed to the handler
+together, so a burst of short messages costs a single AI backend call.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IncomingMessage:
+    """Incoming WhatsApp message extracted from a Green API notification."""
+    phone_number: str
+    text: str
+    id_message: Optional[str] = None
+    id_instance: Optional[str] = None
+    received_at: float = field(default_factory=time.monotonic)
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue is full and the overflow policy is `reject`."""
+
+
+BatchHandler = Callable[[str, List[IncomingMessage]], Awaitable[None]]
+
+
+@dataclass
+class _ChatLane:
+    phone_number: str
+    messages: List[IncomingMessage] = field(default_factory=list)
+    # idle -> waiting (debounce timer armed) -> ready (in the ready queue) -> running
+    state: str = "idle"
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class IncomingPipeline:
+    """
+    Fixed-size worker pool fed by per-sender lanes with a global depth limit.
+
+    Overflow policies (``settings.webhook_queue_overflow``):
+        reject      - raise QueueFullError, the caller answers 503
+        drop_newest - discard the new message
+        drop_oldest - discard the oldest queued message
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        overflow: Optional[str] = None,
+        debounce: Optional[float] = None,
+        max_delay: Optional[float] = None,
+    ):
+        self.handler = handler
+        self.workers = workers or settings.webhook_workers
+        self.max_size = max_size or settings.webhook_queue_size
+        self.overflow = overflow or settings.webhook_queue_overflow
+        self.debounce = settings.webhook_debounce_seconds if debounce is None else debounce
+        self.max_delay = settings.webhook_debounce_max_delay if max_delay is None else max_delay
+        self.dropped = 0
+        self.rejected = 0
+        self.batches = 0
+        self.coalesced = 0
+        self._lanes: Dict[str, _ChatLane] = {}
+        self._pending = 0
+        self._running = 0
+        self._ready: Optional[asyncio.Queue] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def ready(self) -> asyncio.Queue:
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        return self._ready
+
+    @property
+    def idle(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            self._idle.set()
+        return self._idle
+
+    def qsize(self) -> int:
+        """Messages accepted but not yet handed to a worker."""
+        return self._pending
+
+    def running(self) -> int:
+        """Batches currently being handled by a worker."""
+        return self._running
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"incoming-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, drain_timeout: Optional[float] = None) -> None:
+        """Give queued messages a chance to finish, then cancel the workers."""
+        if not self._tasks:
+            return
+        timeout = settings.webhook_drain_timeout if drain_timeout is None else drain_timeout
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Incoming pipeline stopped with {self._pending} unprocessed messages")
+        for lane in self._lanes.values():
+            if lane.timer is not None:
+                lane.timer.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, message: IncomingMessage) -> bool:
+        """
+        Enqueue a message without waiting.
+
+        Returns False if the message was discarded by the overflow policy.
+        """
+        if self._pending >= self.max_size:
+            if self.overflow == "reject":
+                self.rejected += 1
+                raise QueueFullError(f"Incoming queue is full ({self.max_size} messages)")
+
+            self.dropped += 1
+            if self.overflow == "drop_newest" or not self._drop_oldest():
+                logger.warning(f"Incoming queue full, dropped message from {message.phone_number}")
+                return False
+
+        lane = self._lanes.get(message.phone_number)
+        if lane is None:
+            lane = self._lanes[message.phone_number] = _ChatLane(message.phone_number)
+        lane.messages.append(message)
+        self._pending += 1
+        self.idle.clear()
+
+        # A lane that is ready or running picks the message up on its next turn
+        if lane.state in ("idle", "waiting"):
+            self._arm(lane)
+        return True
+
+    def _drop_oldest(self) -> bool:
+        # Only called on overflow, so a linear scan over the lanes is fine
+        oldest = None
+        for lane in self._lanes.values():
+            if lane.messages and (oldest is None or lane.messages[0].received_at < oldest.messages[0].received_at):
+                oldest = lane
+        if oldest is None:
+            return False
+        dropped = oldest.messages.pop(0)
+        self._pending -= 1
+        if not oldest.messages and oldest.state == "waiting":
+            oldest.timer.cancel()
+            del self._lanes[oldest.phone_number]
+        logger.warning(f"Incoming queue full, dropped oldest message from {dropped.phone_number}")
+        return True
+
+    def _arm(self, lane: _ChatLane) -> None:
+        """(Re)start the debounce timer of a lane."""
+        if lane.timer is not None:
+            lane.timer.cancel()
+        now = time.monotonic()
+        first_at = lane.messages[0].received_at
+        last_at = lane.messages[-1].received_at
+        delay = max(0.0, min(last_at + self.debounce, first_at + self.max_delay) - now)
+        lane.state = "waiting"
+        lane.timer = asyncio.get_running_loop().call_later(delay, self._release, lane)
+
+    def _release(self, lane: _ChatLane) -> None:
+        lane.timer = None
+        lane.state = "ready"
+        self.ready.put_nowait(lane)
+
+    async def _worker(self) -> None:
+        ready = self.ready
+        while True:
+            lane = await ready.get()
+            batch, lane.messages = lane.messages, []
+            lane.state = "running"
+            self._pending -= len(batch)
+            self._running += 1
+            try:
+                if batch:
+                    self.batches += 1
+                    self.coalesced += len(batch) - 1
+                    await self.handler(lane.phone_number, batch)
+            except Exception as e:
+                logger.error(f"Error processing messages from {lane.phone_number}: {e}", exc_info=True)
+            finally:
+                self._running -= 1
+                if lane.messages:
+                    self._arm(lane)
+                else:
+                    lane.state = "idle"
+                    del self._lanes[lane.phone_number]
+                if self._pending == 0 and self._running == 0:
+                    self.idle.set()
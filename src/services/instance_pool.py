@@ -0,0 +1,201 @@
+"""
+Routing of outbound traffic across several Green API instances.
+
+Each instance is one WhatsApp number with its own rate limits, so adding
+instances to ``GREEN_API_INSTANCES`` adds sending capacity. Recipients
+are mapped to instances with a consistent-hash ring, so a customer keeps
+hearing from the same number and adding an instance only moves a small
+share of recipients. A customer who wrote to a specific number (seen in
+``instanceData.idInstance`` of the webhook) is answered from that number.
+
+Instances that keep failing are taken out of rotation for a cooldown
+period and their recipients fail over to the next instance on the ring.
+"""
+
+import bisect
+import hashlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+
+from src.config.settings import settings
+from src.services.green_api_client import GreenApiClient, green_api
+from src.services.state_backend import state_backend
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Answers that mean the instance itself refused the request (bad token,
+# not authorized, quota exceeded, throttled): nothing was sent.
+_INSTANCE_REFUSALS = {401, 403, 429, 466}
+
+# Transport errors raised before the request reached Green API
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def _recipient_key(recipient: str) -> str:
+    return recipient.lstrip("+").split("@", 1)[0]
+
+
+class InstanceState:
+    """Health of one instance."""
+
+    def __init__(self, client: GreenApiClient):
+        self.client = client
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.inbound = 0
+
+    @property
+    def healthy(self) -> bool:
+        # After the cooldown the instance gets traffic again; one success restores it
+        return self.unhealthy_until <= time.monotonic()
+
+
+class InstancePool:
+    """
+    Consistent-hash ring of Green API instances with health tracking.
+    """
+
+    def __init__(self, clients: List[GreenApiClient], virtual_nodes: Optional[int] = None):
+        if not clients:
+            raise ValueError("InstancePool needs at least one instance")
+        self.clients = clients
+        self._states: Dict[str, InstanceState] = {c.id_instance: InstanceState(c) for c in clients}
+        # Shared by all workers: the reply may be sent by another worker than the one that got the webhook
+        self._affinity = state_backend.kv("instance-affinity", settings.instance_affinity_size,
+                                          settings.instance_affinity_ttl)
+        self.unknown_inbound = 0
+
+        nodes = virtual_nodes or settings.instance_virtual_nodes
+        ring = sorted(
+            (_hash(f"{client.id_instance}#{i}"), client.id_instance)
+            for client in clients
+            for i in range(nodes)
+        )
+        self._ring_hashes = [h for h, _ in ring]
+        self._ring_ids = [instance_id for _, instance_id in ring]
+
+    @classmethod
+    def from_settings(cls) -> "InstancePool":
+        clients = [
+            GreenApiClient(cfg.id_instance, cfg.api_token_instance, cfg.api_url, cfg.media_url)
+            for cfg in settings.green_api_instances
+        ]
+        return cls(clients or [green_api])
+
+    def get(self, id_instance: Any) -> Optional[GreenApiClient]:
+        state = self._states.get(str(id_instance))
+        return state.client if state else None
+
+    async def candidates(self, recipient: str) -> List[GreenApiClient]:
+        """
+        Instances for a recipient in preference order: the instance the
+        customer wrote to, then the ring successors of the recipient hash.
+        Unhealthy instances go last.
+        """
+        key = _recipient_key(recipient)
+        order: List[str] = []
+        preferred = await self._affinity.get(key)
+        if preferred in self._states:
+            order.append(preferred)
+
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        size = len(self._ring_ids)
+        for offset in range(size):
+            instance_id = self._ring_ids[(start + offset) % size]
+            if instance_id not in order:
+                order.append(instance_id)
+                if len(order) == len(self._states):
+                    break
+
+        states = [self._states[i] for i in order]
+        return [s.client for s in states if s.healthy] + [s.client for s in states if not s.healthy]
+
+    async def route(self, recipient: str) -> GreenApiClient:
+        return (await self.candidates(recipient))[0]
+
+    async def note_inbound(self, phone_number: str, id_instance: Any) -> None:
+        """Remember which instance a customer wrote to."""
+        if id_instance is None:
+            return
+        state = self._states.get(str(id_instance))
+        if state is None:
+            self.unknown_inbound += 1
+            logger.warning(f"Webhook from unknown instance {id_instance}")
+            return
+        state.inbound += 1
+        await self._affinity.set(_recipient_key(phone_number), state.client.id_instance)
+
+    def record_success(self, client: GreenApiClient) -> None:
+        state = self._states[client.id_instance]
+        state.sent += 1
+        state.consecutive_failures = 0
+        state.unhealthy_until = 0.0
+
+    def record_failure(self, client: GreenApiClient) -> None:
+        state = self._states[client.id_instance]
+        state.failed += 1
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= settings.instance_failure_threshold:
+            if state.healthy:
+                logger.warning(f"Green API instance {client.id_instance} marked unhealthy "
+                               f"after {state.consecutive_failures} failures")
+            state.unhealthy_until = time.monotonic() + settings.instance_cooldown
+
+    async def call(self, recipient: str, func: Callable[[GreenApiClient], Awaitable[T]]) -> T:
+        """
+        Run ``func`` against the instance responsible for ``recipient``.
+
+        Fails over to the next instance only when the request was refused
+        or never reached Green API, so a message is never sent twice.
+        Unhealthy instances are tried last rather than never, so traffic
+        still flows when all of them are out of rotation.
+        """
+        last_error: Optional[Exception] = None
+        for client in await self.candidates(recipient):
+            try:
+                result = await func(client)
+            except httpx.HTTPStatusError as exc:
+                status = exc.response.status_code
+                if status in _INSTANCE_REFUSALS or status >= 500:
+                    self.record_failure(client)
+                if status not in _INSTANCE_REFUSALS:
+                    raise
+                last_error = exc
+            except NOT_SENT_ERRORS as exc:
+                self.record_failure(client)
+                last_error = exc
+            except httpx.RequestError:
+                self.record_failure(client)
+                raise
+            else:
+                self.record_success(client)
+                return result
+            logger.warning(f"Green API instance {client.id_instance} failed for {recipient}, trying next: {last_error}")
+        raise last_error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id_instance": state.client.id_instance,
+                "healthy": state.healthy,
+                "consecutive_failures": state.consecutive_failures,
+                "sent": state.sent,
+                "failed": state.failed,
+                "inbound": state.inbound,
+            }
+            for state in self._states.values()
+        ]
+
+
+instance_pool = InstancePool.from_settings()
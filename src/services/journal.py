@@ -0,0 +1,190 @@
+"""
+Append-only journal of incoming notifications and outbound sends.
+
+Records are serialized on the request path into an in-memory buffer and
+written by a background task in batches, so a request never waits for
+the disk. When the buffer is full (the disk cannot keep up) new records
+are dropped and counted rather than slowing requests down.
+
+On disk the journal is a directory of segments, each a sequence of gzip
+members (one per batch) of newline-delimited JSON. A segment is closed
+once it reaches ``journal_segment_bytes`` and the oldest segments are
+deleted beyond ``journal_max_segments``. A process killed mid-write
+loses at most its last batch; readers stop at a truncated member.
+
+Record kinds (all records have the wall-clock time ``t`` and kind ``k``):
+    webhook      - raw /webhook body as text (``raw``)
+    notification - body received by the long-polling consumer (``body``)
+    send         - outbound send request (``kind``, ``request``) with its
+                   outcome (``ok``, ``result`` or ``error``) and ``ms``;
+                   ``upload`` sends (/sendFileUpload) carry the file's
+                   metadata only and are not replayed
+
+``read_journal`` yields records of all segments in time order; see
+benchmarks/replay.py for re-driving them against a running service.
+"""
+
+import asyncio
+import glob
+import gzip
+import heapq
+import logging
+import os
+import time
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import orjson
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_GLOB = "journal-*.ndjson.gz"
+
+
+class Journal:
+    """
+    Buffered segment writer. ``record`` is synchronous and never blocks.
+    """
+
+    def __init__(self, directory: Optional[str] = None, enabled: Optional[bool] = None):
+        self.directory = directory or settings.journal_path
+        self.enabled = settings.journal_enabled if enabled is None else enabled
+        self.segment_bytes = settings.journal_segment_bytes
+        self.max_segments = settings.journal_max_segments
+        self.buffer_size = settings.journal_buffer_size
+        self.batch_size = settings.journal_batch_size
+        self.flush_interval = settings.journal_flush_interval
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._buffer: Deque[bytes] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._segment: Optional[str] = None
+        self._segment_size = 0
+        self._segment_seq = 0
+
+    # --- request path ---
+
+    @property
+    def active(self) -> bool:
+        """Whether records are kept; check it before building costly record fields."""
+        return self._writer is not None
+
+    def record(self, kind: str, /, **fields: Any) -> None:
+        if self._writer is None:
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        # ``kind`` is positional-only so that send records can carry a ``kind`` field
+        fields["t"] = time.time()
+        fields["k"] = kind
+        self._buffer.append(orjson.dumps(fields))
+        self.records += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    # --- lifecycle ---
+
+    async def start(self) -> None:
+        if not self.enabled or self._writer is not None:
+            return
+        await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._writer = asyncio.create_task(self._run(), name="journal-writer")
+
+    async def stop(self) -> None:
+        """Write out what is buffered and close the current segment."""
+        if self._writer is None:
+            return
+        # The writer is not cancelled: a batch being written in a thread would be lost
+        self._stopping = True
+        self._wakeup.set()
+        await self._writer
+        self._writer = None
+
+    # --- writer ---
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Journal write failed: {e}", exc_info=True)
+            if self._stopping:
+                self._segment = None
+                return
+
+    async def _flush(self) -> None:
+        while self._buffer:
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[bytes]) -> None:
+        data = gzip.compress(b"\n".join(batch) + b"\n", compresslevel=6)
+        if self._segment is None or self._segment_size + len(data) > self.segment_bytes:
+            self._rotate()
+        with open(self._segment, "ab") as f:
+            f.write(data)
+        self._segment_size += len(data)
+        self.bytes_written += len(data)
+
+    def _rotate(self) -> None:
+        self._segment_seq += 1
+        # Names sort by creation time; the pid keeps the segments of several workers apart
+        name = f"journal-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._segment_seq:06d}.ndjson.gz"
+        self._segment = os.path.join(self.directory, name)
+        self._segment_size = 0
+        segments = sorted(glob.glob(os.path.join(self.directory, SEGMENT_GLOB)))
+        for old in segments[:max(0, len(segments) + 1 - self.max_segments)]:
+            try:
+                os.remove(old)
+            except OSError as e:
+                logger.warning(f"Failed to delete journal segment {old}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "records": self.records,
+            "dropped": self.dropped,
+            "buffered": len(self._buffer),
+            "bytes_written": self.bytes_written,
+            "segment": self._segment,
+        }
+
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of one segment, up to a truncated tail if there is one."""
+    try:
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error, orjson.JSONDecodeError) as e:
+        logger.warning(f"Journal segment {path} is truncated: {e}")
+
+
+def read_journal(directory: str, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """All records in ``directory`` (segments of every worker merged) in time order."""
+    segments = sorted(glob.glob(os.path.join(directory, SEGMENT_GLOB)))
+    for record in heapq.merge(*(read_segment(path) for path in segments), key=lambda r: r["t"]):
+        if since is not None and record["t"] < since:
+            continue
+        if until is not None and record["t"] >= until:
+            break
+        yield record
+
+
+journal = Journal()
@@ -0,0 +1,345 @@
+"""
+Streaming media relay for ``sendFileByUpload`` with a content-addressed cache.
+
+The source file is streamed in chunks into a spooled temporary file
+(memory up to ``MEDIA_SPOOL_MEMORY``, disk beyond) while its SHA-256 is
+computed, then streamed from there to Green API as a multipart body. The
+whole file is never held in memory.
+
+Green API answers an upload with the ``urlFile`` it stored the file
+under. That URL is cached by content hash, so the next send of the same
+bytes is a plain ``sendFileByUrl`` with no upload. Source URLs are also
+mapped to their hash for a short time, so repeated sends of one catalogue
+image skip even the download. Concurrent sends of the same file share a
+single download and a single upload.
+
+``prepare`` stores a file with ``uploadFile`` without sending anything,
+so a later part of a multi-part reply can be uploaded while the earlier
+ones are still being sent (see compound_service).
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import tempfile
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from src.config.settings import settings
+from src.services.green_api_client import GreenApiClient, connection_pool
+from src.services.instance_pool import instance_pool
+from src.services.state_backend import state_backend
+from src.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaSourceError(Exception):
+    """The file to relay could not be read from its source."""
+
+
+class MediaTooLargeError(MediaSourceError):
+    """The file exceeds ``settings.media_max_bytes``."""
+
+
+class SpooledMedia:
+    """A file buffered in a spooled temporary file, with its hash and size."""
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=settings.media_spool_memory)
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > settings.media_max_bytes:
+            raise MediaTooLargeError(f"File exceeds {settings.media_max_bytes} bytes")
+        self._hash.update(chunk)
+        if self.size > settings.media_spool_memory:
+            # Spilled to disk: keep file I/O off the event loop
+            await asyncio.to_thread(self.file.write, chunk)
+        else:
+            self.file.write(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        await asyncio.to_thread(self.file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _multipart_upload(media: SpooledMedia, fields: Dict[str, str], file_name: str):
+    """
+    Build a streamed multipart/form-data body: returns (headers, body iterator).
+    """
+    boundary = uuid.uuid4().hex
+    mime_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in media.chunks():
+            yield chunk
+        yield tail
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + media.size + len(tail)),
+    }
+    return headers, body
+
+
+class MediaRelay:
+    """
+    Sends files with ``sendFileByUpload`` and remembers where Green API stored them.
+    """
+
+    def __init__(self):
+        # content hash -> {"url_file": Green API urlFile, "size": file size}
+        self._uploads = state_backend.kv("media-uploads", settings.media_cache_size, settings.media_cache_ttl)
+        # source URL -> content hash
+        self._sources = state_backend.kv("media-sources", settings.media_cache_size, settings.media_source_ttl)
+        # source URL -> SpooledMedia being downloaded
+        self._downloads = SingleFlight()
+        # content hash -> upload in progress, resolving to the same dict (None if it failed)
+        self._pending_uploads = SingleFlight()
+        self.hits = 0
+        self.uploads = 0
+        self.downloads = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+
+    # --- public API ---
+
+    async def send_from_url(self, recipient: str, file_url: str, file_name: str,
+                            caption: Optional[str] = None) -> Any:
+        """Relay a file from ``file_url`` to ``recipient``."""
+        digest = await self._sources.get(file_url)
+        if digest is not None:
+            upload = await self._stored_upload(digest)
+            if upload is not None:
+                return await self._send_by_url(recipient, self._reuse(upload), file_name, caption)
+
+        # One download per source URL, however many sends are waiting on it
+        future = self._downloads.get(file_url)
+        if future is None:
+            with self._downloads.lead(file_url, cancelled=MediaSourceError("Download cancelled")) as future:
+                media = await self._download(file_url)
+                future.set_result(media)
+            try:
+                # _send_media registers the pending upload before waiters resume
+                return await self._send_media(recipient, media, file_name, caption)
+            finally:
+                media.close()
+                await self._sources.set(file_url, media.digest)
+
+        media = await asyncio.shield(future)
+        # The downloading send owns the spool; waiters reuse the upload it makes
+        return await self._send_after_upload(recipient, media.digest, file_name, caption)
+
+    async def prepare(self, recipient: str, file_url: str, file_name: str) -> str:
+        """
+        Download the file from ``file_url`` and store it on Green API with
+        ``uploadFile`` without sending it. Returns the ``urlFile`` to pass
+        to ``send_prepared``.
+        """
+        digest = await self._sources.get(file_url)
+        if digest is not None:
+            upload = await self._stored_upload(digest)
+            if upload is not None:
+                return self._reuse(upload)
+
+        future = self._downloads.get(file_url)
+        if future is not None:
+            # A send is already relaying this URL: reuse its upload
+            media = await asyncio.shield(future)
+            return await self._uploaded_url(media.digest)
+
+        media = await self._download(file_url)
+        try:
+            return await self._store_media(recipient, media, file_name)
+        finally:
+            media.close()
+            await self._sources.set(file_url, media.digest)
+
+    async def send_prepared(self, recipient: str, url_file: str, file_name: str,
+                            caption: Optional[str] = None) -> Any:
+        """Send a file stored by ``prepare``."""
+        return await self._send_by_url(recipient, url_file, file_name, caption)
+
+    async def send_from_stream(self, recipient: str, chunks: AsyncIterator[bytes], file_name: str,
+                               caption: Optional[str] = None) -> Any:
+        """Relay a file read from ``chunks`` (e.g. an uploaded form file)."""
+        media = SpooledMedia()
+        try:
+            async for chunk in chunks:
+                await media.write(chunk)
+            return await self._send_media(recipient, media, file_name, caption)
+        finally:
+            media.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._uploads.describe(),
+            "hits": self.hits,
+            "uploads": self.uploads,
+            "downloads": self.downloads,
+            "bytes_uploaded": self.bytes_uploaded,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    # --- internals ---
+
+    async def _download(self, file_url: str) -> SpooledMedia:
+        media = SpooledMedia()
+        try:
+            async with connection_pool.client.stream("GET", file_url, timeout=settings.media_download_timeout) as response:
+                if response.status_code >= 400:
+                    raise MediaSourceError(f"Source returned {response.status_code} for {file_url}")
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    await media.write(chunk)
+        except httpx.HTTPError as e:
+            media.close()
+            raise MediaSourceError(f"Could not download {file_url}: {e}") from e
+        except BaseException:
+            media.close()
+            raise
+        self.downloads += 1
+        return media
+
+    async def _send_media(self, recipient: str, media: SpooledMedia, file_name: str,
+                          caption: Optional[str]) -> Any:
+        digest = media.digest
+        if digest in self._pending_uploads:
+            return await self._send_after_upload(recipient, digest, file_name, caption)
+
+        # Registered before the first await, so concurrent sends of this file wait for us
+        with self._pending_uploads.lead(digest, cancelled=MediaSourceError("Upload cancelled")) as future:
+            upload = await self._stored_upload(digest)
+            if upload is None:
+                result = await self._upload(recipient, media, file_name, caption)
+                url_file = result.get("urlFile") if isinstance(result, dict) else None
+                if url_file:
+                    upload = {"url_file": url_file, "size": media.size}
+                    await self._uploads.set(digest, upload)
+                future.set_result(upload)
+                return result
+            future.set_result(upload)
+        return await self._send_by_url(recipient, self._reuse(upload), file_name, caption)
+
+    async def _store_media(self, recipient: str, media: SpooledMedia, file_name: str) -> str:
+        digest = media.digest
+        if digest in self._pending_uploads:
+            return await self._uploaded_url(digest)
+
+        # Same protocol as _send_media: sends of this file wait for the upload in progress
+        with self._pending_uploads.lead(digest, cancelled=MediaSourceError("Upload cancelled")) as future:
+            upload = await self._stored_upload(digest)
+            if upload is None:
+                upload = {"url_file": await self._upload_file(recipient, media, file_name), "size": media.size}
+                await self._uploads.set(digest, upload)
+                future.set_result(upload)
+                return upload["url_file"]
+            future.set_result(upload)
+        return self._reuse(upload)
+
+    async def _send_after_upload(self, recipient: str, digest: str, file_name: str,
+                                 caption: Optional[str]) -> Any:
+        url_file = await self._uploaded_url(digest)
+        return await self._send_by_url(recipient, url_file, file_name, caption)
+
+    async def _uploaded_url(self, digest: str) -> str:
+        # The upload stores urlFile before it stops being pending, so check in this order
+        future = self._pending_uploads.get(digest)
+        if future is not None:
+            upload = await asyncio.shield(future)
+            if upload is None:
+                raise MediaSourceError("Green API did not return urlFile for the upload")
+        else:
+            upload = await self._stored_upload(digest)
+            if upload is None:
+                raise MediaSourceError("File is no longer available for relaying")
+        return self._reuse(upload)
+
+    async def _stored_upload(self, digest: str) -> Optional[Dict[str, Any]]:
+        upload = await self._uploads.get(digest)
+        if isinstance(upload, str):
+            # Cached before sizes were kept
+            return {"url_file": upload, "size": 0}
+        return upload
+
+    def _reuse(self, upload: Dict[str, Any]) -> str:
+        """Count a send that needed no upload and return its urlFile."""
+        self.hits += 1
+        self.bytes_saved += upload["size"]
+        return upload["url_file"]
+
+    async def _upload(self, recipient: str, media: SpooledMedia, file_name: str,
+                      caption: Optional[str]) -> Any:
+        fields = {"chatId": f"{recipient.replace('+', '')}@c.us", "fileName": file_name}
+        if caption:
+            fields["caption"] = caption
+
+        async def upload(client: GreenApiClient) -> Any:
+            headers, body = _multipart_upload(media, fields, file_name)
+            return await client.send_file_by_upload(body(), headers)
+
+        result = await instance_pool.call(recipient, upload)
+        self.uploads += 1
+        self.bytes_uploaded += media.size
+        return result
+
+    async def _upload_file(self, recipient: str, media: SpooledMedia, file_name: str) -> str:
+        headers = {
+            "Content-Type": mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+            "Content-Length": str(media.size),
+            "GA-Filename": file_name,
+        }
+
+        async def upload(client: GreenApiClient) -> Any:
+            return await client.upload_file(media.chunks(), headers)
+
+        # Same instance as the send that will use it
+        result = await instance_pool.call(recipient, upload)
+        url_file = result.get("urlFile") if isinstance(result, dict) else None
+        if not url_file:
+            raise MediaSourceError("Green API did not return urlFile for the upload")
+        self.uploads += 1
+        self.bytes_uploaded += media.size
+        return url_file
+
+    async def _send_by_url(self, recipient: str, url_file: str, file_name: str,
+                           caption: Optional[str]) -> Any:
+        payload = {
+            "chatId": f"{recipient.replace('+', '')}@c.us",
+            "urlFile": url_file,
+            "fileName": file_name,
+        }
+        if caption:
+            payload["caption"] = caption
+        return await instance_pool.call(recipient, lambda client: client.send_file_by_url(payload))
+
+
+media_relay = MediaRelay()
@@ -0,0 +1,154 @@
+"""
+Shared entry point for Green API notifications.
+
+Both the `/webhook` endpoint and the long-polling consumer hand the
+notification here; it is classified, then incoming messages are
+deduplicated and queued for the AI backend and delivery statuses are
+indexed. Both are published to live event stream subscribers.
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import orjson
+from pydantic import ValidationError
+
+from src.models.webhook import IncomingMessageWebhook, OutgoingMessageStatusWebhook
+from src.services.conversation_service import incoming_pipeline
+from src.services.delivery_status import delivery_status
+from src.services.event_hub import event_hub, message_event, notification_event, status_event
+from src.services.incoming_pipeline import IncomingMessage
+from src.services.instance_pool import instance_pool
+from src.services.journal import journal
+from src.services.webhook_dedup import webhook_dedup
+from src.services.webhook_parser import ADAPTERS, parse_dict, parse_raw, read_type_webhook
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ACK_IGNORED = {"status": "ok", "message": "Webhook received"}
+
+# Label values are limited to the documented types so a bad sender cannot blow up the series count
+KNOWN_TYPES = {
+    "incomingMessageReceived", "outgoingMessageReceived", "outgoingAPIMessageReceived",
+    "outgoingMessageStatus", "stateInstanceChanged", "statusInstanceChanged", "deviceInfo",
+    "incomingCall", "incomingBlock", "quotaExceeded",
+}
+
+NOTIFICATIONS_RECEIVED = registry.counter(
+    "notifications_received_total", "Green API notifications received by source and typeWebhook.",
+    ("source", "type"))
+
+
+def _count(source: str, type_webhook: Optional[str]) -> None:
+    if type_webhook is None:
+        label = "unknown"
+    elif type_webhook in KNOWN_TYPES:
+        label = type_webhook
+    else:
+        label = "other"
+    NOTIFICATIONS_RECEIVED.inc(source, label)
+
+
+async def ingest_raw(raw: bytes) -> Dict[str, str]:
+    """
+    Ingest a raw webhook body. Uninteresting types are acknowledged
+    without being decoded.
+    """
+    if journal.active:
+        journal.record("webhook", raw=raw.decode("utf-8", "replace"))
+    type_webhook = read_type_webhook(raw)
+    _count("webhook", type_webhook)
+    if type_webhook not in ADAPTERS:
+        if type_webhook is None:
+            logger.warning("Received webhook in unknown format")
+        elif event_hub.wants(type_webhook):
+            # Decoded only when someone listens
+            data = orjson.loads(raw)
+            if isinstance(data, dict):
+                event_hub.publish(notification_event(data))
+        return ACK_IGNORED
+    try:
+        notification = parse_raw(raw, type_webhook)
+    except ValidationError as e:
+        logger.warning(f"Invalid {type_webhook} webhook: {e.errors(include_url=False, include_input=False)}")
+        return ACK_IGNORED
+    return await HANDLERS[type_webhook](notification)
+
+
+async def ingest_notification(data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Ingest an already decoded notification body (long-polling consumer).
+    """
+    if journal.active:
+        journal.record("notification", body=data)
+    type_webhook = data.get("typeWebhook")
+    _count("polling", type_webhook if isinstance(type_webhook, str) else None)
+    if type_webhook not in ADAPTERS:
+        if type_webhook is None:
+            logger.warning("Received webhook in unknown format")
+        elif event_hub.wants(type_webhook):
+            event_hub.publish(notification_event(data))
+        return ACK_IGNORED
+    try:
+        notification = parse_dict(data, type_webhook)
+    except ValidationError as e:
+        logger.warning(f"Invalid {type_webhook} notification: {e.errors(include_url=False, include_input=False)}")
+        return ACK_IGNORED
+    return await HANDLERS[type_webhook](notification)
+
+
+async def ingest_message(notification: IncomingMessageWebhook) -> Dict[str, str]:
+    """
+    Queue an incoming message for processing.
+
+    Returns the acknowledgement body. Raises QueueFullError when the
+    pipeline refuses the message; the caller must not acknowledge it then.
+    """
+    id_message = notification.idMessage
+    if not await webhook_dedup.check_and_mark(id_message):
+        logger.info(f"Duplicate webhook {id_message} ignored")
+        return {"status": "ok", "message": "Duplicate webhook ignored"}
+
+    phone_number = notification.phone_number
+    id_instance = str(notification.instanceData.idInstance) if notification.instanceData else None
+    # AI backend calls run in the background pipeline, the notification is acknowledged right away
+    try:
+        # Replies to this customer go out through the number they wrote to
+        await instance_pool.note_inbound(phone_number, id_instance)
+        accepted = incoming_pipeline.submit(IncomingMessage(
+            phone_number=phone_number,
+            text=notification.messageData.text,
+            id_message=id_message,
+            id_instance=id_instance,
+        ))
+    except Exception:
+        await webhook_dedup.forget(id_message)
+        raise
+
+    if event_hub.wants(notification.typeWebhook):
+        event_hub.publish(message_event(notification))
+
+    if not accepted:
+        return {"status": "ok", "message": "Webhook received, message dropped"}
+
+    return {"status": "ok", "message": "Webhook received and queued"}
+
+
+async def ingest_status(notification: OutgoingMessageStatusWebhook) -> Dict[str, str]:
+    """
+    Record the delivery status of a sent message. Redelivered statuses are
+    harmless (an older status never replaces a newer one), so they are not
+    deduplicated.
+    """
+    await delivery_status.update(notification)
+    if event_hub.wants(notification.typeWebhook):
+        event_hub.publish(status_event(notification))
+    return {"status": "ok", "message": "Status recorded"}
+
+
+# typeWebhook -> handler, for the types listed in webhook_parser.ADAPTERS
+HANDLERS: Dict[str, Callable[[Any], Awaitable[Dict[str, str]]]] = {
+    "incomingMessageReceived": ingest_message,
+    "outgoingMessageStatus": ingest_status,
+}
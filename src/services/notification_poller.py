@@ -0,0 +1,107 @@
+"""
+Long-polling consumer for Green API notifications.
+
+Alternative to the `/webhook` endpoint for deployments that cannot be
+reached from the internet. Notifications are pulled with
+``receiveNotification`` and fed into the same ingest path as webhooks.
+Green API returns the head of the queue until it is deleted, so the next
+poll has to wait for ``deleteNotification``; the delete is started as
+soon as a notification arrives and runs while it is ingested, so it
+costs no round trip of its own. A notification the incoming pipeline
+refuses (queue full) is held and offered again before polling on.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from src.config.settings import settings
+from src.services.green_api_client import GreenApiClient
+from src.services.incoming_pipeline import QueueFullError
+from src.services.instance_pool import instance_pool
+from src.services.notification_ingest import ingest_notification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationPoller:
+    """
+    Background task pulling notifications of one Green API instance.
+    """
+
+    def __init__(self, client: GreenApiClient, receive_timeout: Optional[int] = None):
+        self.client = client
+        self.receive_timeout = receive_timeout or settings.notifications_receive_timeout
+        self._ack: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.acked = 0
+        self.ack_errors = 0
+        self.receive_errors = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"notification-poller-{self.client.id_instance}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Let the delete in flight finish so the notification is not redelivered
+        if self._ack is not None:
+            await asyncio.gather(self._ack, return_exceptions=True)
+            self._ack = None
+
+    async def _delete(self, receipt_id: int) -> None:
+        try:
+            await self.client.delete_notification(receipt_id)
+            self.acked += 1
+        except Exception as e:
+            # Not fatal: Green API redelivers it and the dedup store drops the repeat
+            self.ack_errors += 1
+            logger.warning(f"Failed to delete notification {receipt_id}: {e}")
+
+    async def _ingest(self, receipt_id: Optional[int], body: dict) -> None:
+        backoff = settings.notifications_error_backoff
+        while True:
+            try:
+                await ingest_notification(body)
+                return
+            except QueueFullError as e:
+                # Already being deleted from Green API: hold it here until the pipeline has room
+                logger.warning(f"Notification {receipt_id} not accepted, retrying: {e}")
+                await asyncio.sleep(backoff)
+            except Exception as e:
+                logger.error(f"Error processing notification {receipt_id}: {e}", exc_info=True)
+                return
+
+    async def _run(self) -> None:
+        backoff = settings.notifications_error_backoff
+        while True:
+            try:
+                notification = await self.client.receive_notification(self.receive_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.receive_errors += 1
+                logger.error(f"receiveNotification failed: {e}")
+                await asyncio.sleep(backoff)
+                continue
+
+            if not notification:
+                continue
+
+            self.received += 1
+            receipt_id = notification.get("receiptId")
+            if receipt_id is not None:
+                self._ack = asyncio.create_task(self._delete(receipt_id))
+            await self._ingest(receipt_id, notification.get("body") or {})
+            if self._ack is not None:
+                # Shielded: a stop() while waiting must not abandon the delete
+                await asyncio.shield(self._ack)
+                self._ack = None
+
+
+# One consumer per instance: every number has its own notification queue
+notification_pollers = [NotificationPoller(client) for client in instance_pool.clients]
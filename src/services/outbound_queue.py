@@ -0,0 +1,263 @@
+"""
+Durable outbound send queue backed by a local SQLite file.
+
+Jobs survive restarts: anything that was in progress when the process
+stopped is picked up again on startup. Failures that prove the message
+was not sent (connection errors, pool timeouts, 429) are retried with
+exponential backoff and full jitter. Anything after which Green API may
+have sent it (read timeouts, broken connections, 5xx) is not retried, so
+the customer does not get it twice; such jobs, permanent failures and
+jobs that run out of attempts end up in the ``dead`` state.
+
+Several worker processes (``WEB_CONCURRENCY``) may share the file: a job
+is claimed with a lease, and a job whose lease ran out because its process
+died mid-send is claimed again by a process that is still running.
+
+Job states: queued -> in_progress -> sent | queued (retry) | dead
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+import orjson
+
+from src.config.settings import settings
+from src.models.whatsapp_message import WhatsAppMessageRequest, WhatsAppFileRequest
+from src.services.instance_pool import NOT_SENT_ERRORS
+from src.services.whatsapp_service import deliver
+
+logger = logging.getLogger(__name__)
+
+SendRequest = Union[WhatsAppMessageRequest, WhatsAppFileRequest]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS outbound_jobs_due ON outbound_jobs (status, next_attempt_at);
+"""
+
+_KINDS = {
+    "message": WhatsAppMessageRequest,
+    "file": WhatsAppFileRequest,
+}
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Whether the send provably did not reach Green API, so retrying cannot duplicate it."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429
+    return isinstance(exc, NOT_SENT_ERRORS)
+
+
+class OutboundQueue:
+    """
+    SQLite-backed job queue drained by a pool of async workers.
+
+    SQLite calls are short and run in a worker thread so they never block
+    the event loop.
+    """
+
+    def __init__(self, path: Optional[str] = None, workers: Optional[int] = None):
+        self.path = path or settings.outbound_queue_path
+        self.workers = workers or settings.outbound_workers
+        self.max_attempts = settings.outbound_max_attempts
+        self.backoff_base = settings.outbound_backoff_base
+        self.backoff_max = settings.outbound_backoff_max
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._last_purge = 0.0
+
+    # --- SQLite helpers (run in a thread) ---
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(outbound_jobs)")}
+        if "lease_until" not in columns:
+            conn.execute("ALTER TABLE outbound_jobs ADD COLUMN lease_until REAL")
+        if settings.web_concurrency == 1:
+            # Jobs that were being sent when the process died are retried right away;
+            # with several workers they may belong to a live process and wait for their lease
+            conn.execute(
+                "UPDATE outbound_jobs SET status='queued', updated_at=? WHERE status='in_progress'",
+                (time.time(),),
+            )
+        self._conn = conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    # --- lifecycle ---
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        await asyncio.to_thread(self._open)
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"outbound-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._conn is not None:
+            # In-flight jobs stay `in_progress` and are requeued on the next start
+            # (or by another worker once their lease runs out)
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    # --- public API ---
+
+    async def enqueue(self, request: SendRequest) -> Dict[str, Any]:
+        kind = "file" if isinstance(request, WhatsAppFileRequest) else "message"
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self._run(
+            "INSERT INTO outbound_jobs (id, kind, payload, status, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, orjson.dumps(request.model_dump(mode="json")).decode(), now, now, now),
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return {"job_id": job_id, "status": "queued"}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run("SELECT * FROM outbound_jobs WHERE id=?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "next_attempt_at": row["next_attempt_at"] if row["status"] == "queued" else None,
+            "last_error": row["last_error"],
+            "result": orjson.loads(row["result"]) if row["result"] else None,
+            "request": orjson.loads(row["payload"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await self._run("SELECT status, COUNT(*) AS n FROM outbound_jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+    # --- workers ---
+
+    async def _claim(self) -> Optional[sqlite3.Row]:
+        now = time.time()
+        rows = await self._run(
+            "UPDATE outbound_jobs SET status='in_progress', attempts=attempts+1, updated_at=?, lease_until=? "
+            "WHERE id=(SELECT id FROM outbound_jobs WHERE (status='queued' AND next_attempt_at<=?) "
+            "OR (status='in_progress' AND COALESCE(lease_until, 0)<=?) ORDER BY next_attempt_at LIMIT 1) RETURNING *",
+            (now, now + settings.outbound_job_lease, now, now),
+        )
+        return rows[0] if rows else None
+
+    async def _next_due_in(self) -> float:
+        rows = await self._run("SELECT MIN(next_attempt_at) AS due FROM outbound_jobs WHERE status='queued'")
+        due = rows[0]["due"] if rows else None
+        if due is None:
+            return settings.outbound_poll_interval
+        return min(max(due - time.time(), 0.0), settings.outbound_poll_interval)
+
+    def _backoff(self, attempts: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)))
+
+    async def _finish(self, job_id: str, status: str, error: Optional[str] = None, result: Any = None,
+                      next_attempt_at: Optional[float] = None) -> None:
+        now = time.time()
+        await self._run(
+            "UPDATE outbound_jobs SET status=?, last_error=?, result=?, next_attempt_at=COALESCE(?, next_attempt_at), "
+            "updated_at=?, lease_until=NULL WHERE id=?",
+            (status, error, orjson.dumps(result).decode() if result is not None else None, next_attempt_at, now, job_id),
+        )
+
+    async def _purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        await self._run(
+            "DELETE FROM outbound_jobs WHERE status IN ('sent', 'dead') AND updated_at<?",
+            (now - settings.outbound_job_retention,),
+        )
+
+    async def _process(self, job: sqlite3.Row) -> None:
+        try:
+            request = _KINDS[job["kind"]].model_validate(orjson.loads(job["payload"]))
+            result = await deliver(request)
+        except Exception as exc:
+            detail = str(exc)
+            if isinstance(exc, httpx.HTTPStatusError):
+                detail = f"{exc.response.status_code} - {exc.response.text}"
+            if not is_retryable(exc) or job["attempts"] >= self.max_attempts:
+                logger.error(f"Outbound job {job['id']} failed permanently after {job['attempts']} attempts: {detail}")
+                await self._finish(job["id"], "dead", error=detail)
+            else:
+                delay = self._backoff(job["attempts"])
+                logger.warning(f"Outbound job {job['id']} attempt {job['attempts']} failed, retrying in {delay:.1f}s: {detail}")
+                await self._finish(job["id"], "queued", error=detail, next_attempt_at=time.time() + delay)
+        else:
+            await self._finish(job["id"], "sent", result=result)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                # Clear before claiming so an enqueue racing with an empty claim is not missed
+                self._wakeup.clear()
+                job = await self._claim()
+                if job is None:
+                    await self._purge()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=await self._next_due_in())
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbound queue worker error: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+
+outbound_queue = OutboundQueue()
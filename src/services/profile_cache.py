@@ -0,0 +1,85 @@
+"""
+Cache for AI backend ``/ai/getProfile`` lookups, kept in the state backend.
+
+Most incoming traffic comes from phones without a profile, so negative
+results are cached too (with their own, usually shorter, TTL). Concurrent
+lookups for the same phone in one worker share one backend request.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.config.settings import settings
+from src.services.ai_backend_client import ai_backend
+from src.services.state_backend import state_backend
+from src.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+ProfileLoader = Callable[[str], Awaitable[Any]]
+
+
+class ProfileCache:
+    """
+    LRU/TTL cache of profiles keyed by phone number, with single-flight loading.
+    """
+
+    def __init__(
+        self,
+        loader: ProfileLoader,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+    ):
+        self.loader = loader
+        self.ttl = settings.profile_cache_ttl if ttl is None else ttl
+        self.negative_ttl = settings.profile_cache_negative_ttl if negative_ttl is None else negative_ttl
+        self._cache = state_backend.kv("profile", max_size or settings.profile_cache_size, self.ttl)
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, phone_number: str) -> Any:
+        """Return the cached profile or load it (once) from the backend."""
+        future = self._inflight.get(phone_number)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        with self._inflight.lead(phone_number, cancelled=RuntimeError("Profile lookup was cancelled")) as future:
+            profile = await self._cache.get(phone_number, _MISSING)
+            if profile is _MISSING:
+                self.misses += 1
+                profile = await self.loader(phone_number)
+                # Skip the store if the entry was invalidated while the lookup was in flight
+                if self._inflight.get(phone_number) is future:
+                    await self._cache.set(phone_number, profile, self.ttl if profile else self.negative_ttl)
+            elif profile:
+                self.hits += 1
+            else:
+                self.negative_hits += 1
+            future.set_result(profile)
+        return profile
+
+    async def invalidate(self, phone_number: str) -> None:
+        self._inflight.forget(phone_number)
+        await self._cache.delete(phone_number)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            **self._cache.describe(),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.negative_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+profile_cache = ProfileCache(ai_backend.get_profile)
@@ -0,0 +1,70 @@
+"""
+Conversation resets on the AI backend, one phone or many at once.
+
+A reset is ``resetConversation`` followed by ``initConversation`` for the
+same phone. Bulk resets run several phones concurrently, while the two
+calls of each phone stay in order.
+"""
+
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from src.config.settings import settings
+from src.services.ai_backend_client import AIBackendUnavailableError, ai_backend
+from src.services.bulk_service import run_bulk
+from src.services.profile_cache import profile_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def reset_conversation(client_phone: str) -> None:
+    """
+    Reset the conversation of one phone.
+
+    Raises HTTPException with 503 when the AI backend sheds the call,
+    504 on timeout and 502 for other backend errors.
+    """
+    try:
+        await ai_backend.reset_conversation(client_phone)
+        await ai_backend.init_conversation(client_phone)
+    except AIBackendUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="AI backend timed out")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"AI backend error: {e.response.status_code}")
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"AI backend unreachable: {e}")
+    finally:
+        # Even a half-done reset may have changed the profile
+        await profile_cache.invalidate(client_phone)
+
+
+async def reset_item(index: int, client_phone: str) -> Dict:
+    """Reset one phone of a bulk request and describe the outcome instead of raising."""
+    result: Dict = {"index": index, "client_phone": client_phone}
+    try:
+        await reset_conversation(client_phone)
+    except HTTPException as exc:
+        result.update(status="error", status_code=exc.status_code, detail=exc.detail)
+    except Exception as exc:
+        logger.error(f"Unexpected error resetting {client_phone}: {exc}", exc_info=True)
+        result.update(status="error", status_code=500, detail=str(exc))
+    else:
+        result.update(status="ok")
+    return result
+
+
+def reset_bulk(client_phones: List[str], concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Reset phones with at most ``concurrency`` in progress and yield one
+    NDJSON line per phone as soon as it is done, followed by a summary line.
+
+    Repeated phones are reset once (two concurrent resets of one phone could
+    interleave their delete and init calls).
+    """
+    phones = list(dict.fromkeys(client_phones))
+    return run_bulk(phones, reset_item, concurrency or settings.bulk_reset_concurrency, ok_key="reset")
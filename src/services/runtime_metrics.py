@@ -0,0 +1,142 @@
+"""
+Scrape-time gauges for the in-process queues and caches, plus the
+in-flight gauge of this service's own HTTP requests.
+
+Upstream latency and error metrics are recorded where the calls are made
+(green_api_client, ai_backend_client, notification_ingest); this module
+only reads counters the services already keep.
+"""
+
+from src.services.ai_backend_client import ai_backend
+from src.services.conversation_service import incoming_pipeline
+from src.services.delivery_status import delivery_status
+from src.services.idempotency import idempotency_store
+from src.services.event_hub import event_hub
+from src.services.instance_pool import instance_pool
+from src.services.journal import journal
+from src.services.media_relay import media_relay
+from src.services.notification_poller import notification_pollers
+from src.services.profile_cache import profile_cache
+from src.services.webhook_dedup import webhook_dedup
+from src.utils.metrics import registry
+
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "Requests to this service currently being handled.")
+
+
+class InFlightMiddleware:
+    """Plain ASGI middleware, so streaming responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+
+
+registry.callback(
+    "incoming_pipeline_pending", "Incoming messages waiting for a worker.", incoming_pipeline.qsize)
+registry.callback(
+    "incoming_pipeline_running", "Incoming batches being processed.", incoming_pipeline.running)
+registry.callback(
+    "incoming_pipeline_batches_total", "Batches handed to the AI backend.",
+    lambda: incoming_pipeline.batches, type_name="counter")
+registry.callback(
+    "incoming_pipeline_coalesced_total", "Messages merged into an earlier batch by the debounce window.",
+    lambda: incoming_pipeline.coalesced, type_name="counter")
+registry.callback(
+    "incoming_pipeline_overflow_total", "Messages dropped or rejected because the queue was full.",
+    lambda: {("dropped",): incoming_pipeline.dropped, ("rejected",): incoming_pipeline.rejected},
+    labelnames=("action",), type_name="counter")
+
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+registry.callback(
+    "ai_backend_circuit_state", "AI backend circuit breaker: 0 closed, 1 half open, 2 open.",
+    lambda: _CIRCUIT_STATES[ai_backend.breaker.state])
+registry.callback(
+    "ai_backend_concurrency_limit", "Current adaptive concurrency limit per AI backend route.",
+    lambda: {(route,): limiter.limit for route, limiter in ai_backend.limiters.items()},
+    labelnames=("route",))
+registry.callback(
+    "ai_backend_waiting", "AI backend calls waiting for a concurrency slot.",
+    lambda: {(route,): limiter.waiting() for route, limiter in ai_backend.limiters.items()},
+    labelnames=("route",))
+
+registry.callback(
+    "webhook_duplicates_total", "Notifications ignored as redeliveries.",
+    lambda: webhook_dedup.duplicates, type_name="counter")
+
+registry.callback(
+    "profile_cache_requests_total", "Profile cache lookups by result.",
+    lambda: {
+        ("hit",): profile_cache.hits,
+        ("negative_hit",): profile_cache.negative_hits,
+        ("miss",): profile_cache.misses,
+        ("coalesced",): profile_cache.coalesced,
+    },
+    labelnames=("result",), type_name="counter")
+
+registry.callback(
+    "delivery_status_updates_total", "Status notifications applied to the index, and ignored as out of order.",
+    lambda: {("applied",): delivery_status.updates, ("out_of_order",): delivery_status.out_of_order},
+    labelnames=("result",), type_name="counter")
+registry.callback(
+    "delivery_status_lookups_total", "Message ids looked up in the status index by result.",
+    lambda: {("found",): delivery_status.found, ("missing",): delivery_status.lookups - delivery_status.found},
+    labelnames=("result",), type_name="counter")
+
+registry.callback(
+    "idempotent_requests_total", "Requests with an Idempotency-Key by outcome.",
+    lambda: {
+        ("executed",): idempotency_store.executed,
+        ("replayed",): idempotency_store.replayed,
+        ("coalesced",): idempotency_store.coalesced,
+        ("conflict",): idempotency_store.conflicts,
+    },
+    labelnames=("outcome",), type_name="counter")
+
+registry.callback(
+    "media_cache_hits_total", "File sends served from the upload cache.",
+    lambda: media_relay.hits, type_name="counter")
+registry.callback(
+    "media_uploaded_bytes_total", "Bytes uploaded with sendFileByUpload.",
+    lambda: media_relay.bytes_uploaded, type_name="counter")
+
+registry.callback(
+    "event_stream_subscribers", "Connected /events subscribers.", lambda: len(event_hub))
+registry.callback(
+    "event_stream_published_total", "Events published to the live stream.",
+    lambda: event_hub.published, type_name="counter")
+registry.callback(
+    "event_stream_dropped_subscribers_total", "Subscribers disconnected for falling behind.",
+    lambda: event_hub.dropped_subscribers, type_name="counter")
+
+registry.callback(
+    "journal_records_total", "Records written to the traffic journal by result.",
+    lambda: {("buffered",): journal.records, ("dropped",): journal.dropped},
+    labelnames=("result",), type_name="counter")
+registry.callback(
+    "journal_bytes_written_total", "Compressed bytes written to journal segments.",
+    lambda: journal.bytes_written, type_name="counter")
+
+registry.callback(
+    "green_api_instance_healthy", "1 if the instance is in rotation.",
+    lambda: {(s["id_instance"],): int(s["healthy"]) for s in instance_pool.stats()},
+    labelnames=("instance",))
+
+registry.callback(
+    "notification_acks_total", "deleteNotification acks by result.",
+    lambda: {
+        (poller.client.id_instance, result): value
+        for poller in notification_pollers
+        for result, value in (("ok", poller.acked), ("error", poller.ack_errors))
+    },
+    labelnames=("instance", "result"), type_name="counter")
@@ -0,0 +1,378 @@
+"""
+Pluggable storage for state that must be shared by all worker processes.
+
+Caches, the webhook dedup set, chat leases and the Green API send rate
+limits live behind this interface, so the service can run several
+uvicorn workers (``WEB_CONCURRENCY``) without one worker replying to a
+message another one already handled or two workers each spending the
+full send rate of an instance.
+
+Backends (``STATE_BACKEND``):
+    memory - in-process structures, for a single worker (default)
+    sqlite - one SQLite file in WAL mode (``STATE_PATH``) shared by all
+             workers on the host
+
+The durable outbound queue already lives in its own SQLite file and
+coordinates workers itself (see outbound_queue).
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from src.config.settings import settings
+from src.utils.rate_limit import TokenBucket
+from src.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class KeyValueStore:
+    """
+    Namespaced key-value store with per-entry expiry.
+
+    Values must be JSON-serializable. ``get`` tells a stored ``None`` from a
+    missing key through ``default``.
+    """
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Values of the keys that are present."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def add(self, key: str, value: Any = True, ttl: Optional[float] = None) -> bool:
+        """Store only if the key is absent (or expired). Returns True if stored."""
+        raise NotImplementedError
+
+    async def update(self, key: str, change: Callable[[Any], Any], ttl: Optional[float] = None) -> bool:
+        """
+        Atomically replace the value with ``change(current)`` (``current`` is
+        None when the key is absent); ``change`` returns None to leave it as
+        is. Returns True if a value was stored.
+        """
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        """Size information for stats endpoints."""
+        return {}
+
+
+class StateBackend:
+    """Factory for the stores and rate limiters used by the services."""
+
+    # True when the state is visible to other worker processes
+    shared = False
+
+    def kv(self, name: str, max_size: int, ttl: float) -> KeyValueStore:
+        raise NotImplementedError
+
+    def token_bucket(self, name: str, rate: float, burst: float):
+        """Return an object with ``async acquire(tokens=1)``, like TokenBucket."""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+# --- in-process backend ---
+
+_MISSING = object()
+
+
+class MemoryKeyValueStore(KeyValueStore):
+    def __init__(self, max_size: int, ttl: float):
+        self._cache: TTLCache[Any] = TTLCache(max_size, ttl)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return self._cache.get(key, default)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        for key in keys:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def add(self, key: str, value: Any = True, ttl: Optional[float] = None) -> bool:
+        return self._cache.add(key, value, ttl)
+
+    async def update(self, key: str, change: Callable[[Any], Any], ttl: Optional[float] = None) -> bool:
+        # Nothing is awaited between the read and the write
+        value = change(self._cache.get(key))
+        if value is None:
+            return False
+        self._cache.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"size": len(self._cache), "max_size": self._cache.max_size, "evictions": self._cache.evictions}
+
+
+class MemoryStateBackend(StateBackend):
+    shared = False
+
+    def kv(self, name: str, max_size: int, ttl: float) -> KeyValueStore:
+        return MemoryKeyValueStore(max_size, ttl)
+
+    def token_bucket(self, name: str, rate: float, burst: float) -> TokenBucket:
+        return TokenBucket(rate, burst)
+
+
+# --- SQLite backend ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    written_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    key TEXT PRIMARY KEY,
+    tat REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteKeyValueStore(KeyValueStore):
+    """
+    Rows of the shared ``kv`` table in namespace ``name``.
+
+    Entries are bounded by their TTL and by ``max_size``: the backend
+    deletes expired rows and the least recently written rows beyond
+    ``max_size`` in the background, so a namespace may briefly exceed it.
+    """
+
+    def __init__(self, backend: "SQLiteStateBackend", name: str, max_size: int, ttl: float):
+        self.backend = backend
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        rows = await self.backend.run(
+            "SELECT value FROM kv WHERE ns=? AND key=? AND expires_at>?", (self.name, key, time.time()))
+        return orjson.loads(rows[0][0]) if rows else default
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        now = time.time()
+        # Stays well below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = await self.backend.run(
+                f"SELECT key, value FROM kv WHERE ns=? AND key IN ({','.join('?' * len(chunk))}) AND expires_at>?",
+                (self.name, *chunk, now))
+            found.update((key, orjson.loads(value)) for key, value in rows)
+        return found
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        await self.backend.run(
+            "INSERT OR REPLACE INTO kv (ns, key, value, expires_at, written_at) VALUES (?, ?, ?, ?, ?)",
+            (self.name, key, orjson.dumps(value), expires_at, now))
+
+    async def add(self, key: str, value: Any = True, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        # An expired row counts as absent; RETURNING yields a row only if we stored ours
+        rows = await self.backend.run(
+            "INSERT INTO kv (ns, key, value, expires_at, written_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (ns, key) DO UPDATE SET value=excluded.value, expires_at=excluded.expires_at, "
+            "written_at=excluded.written_at WHERE kv.expires_at<=? RETURNING 1",
+            (self.name, key, orjson.dumps(value), expires_at, now, now))
+        return bool(rows)
+
+    async def update(self, key: str, change: Callable[[Any], Any], ttl: Optional[float] = None) -> bool:
+        def read_modify_write(conn: sqlite3.Connection) -> bool:
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM kv WHERE ns=? AND key=? AND expires_at>?", (self.name, key, now)).fetchone()
+            value = change(orjson.loads(row[0]) if row else None)
+            if value is None:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires_at, written_at) VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, orjson.dumps(value), now + (self.ttl if ttl is None else ttl), now))
+            return True
+
+        return await self.backend.transaction(read_modify_write)
+
+    async def delete(self, key: str) -> None:
+        await self.backend.run("DELETE FROM kv WHERE ns=? AND key=?", (self.name, key))
+
+    async def trim(self) -> None:
+        """Delete the least recently written entries beyond ``max_size``."""
+        rows = await self.backend.run("SELECT COUNT(*) FROM kv WHERE ns=?", (self.name,))
+        excess = rows[0][0] - self.max_size
+        if excess > 0:
+            await self.backend.run(
+                "DELETE FROM kv WHERE ns=? AND key IN (SELECT key FROM kv WHERE ns=? ORDER BY written_at LIMIT ?)",
+                (self.name, self.name, excess))
+            self.evictions += excess
+
+    def describe(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "max_size": self.max_size, "evictions": self.evictions}
+
+
+class SQLiteTokenBucket:
+    """
+    Token bucket shared by all processes using the same SQLite file.
+
+    Implemented as GCRA: the row holds the theoretical arrival time of the
+    next request, and every acquire moves it forward atomically by
+    ``tokens / rate``, so each caller learns how long to wait from a
+    single statement.
+    """
+
+    def __init__(self, backend: "SQLiteStateBackend", name: str, rate: float, burst: float):
+        self.backend = backend
+        self.name = name
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        now = time.time()
+        interval = tokens / self.rate
+        rows = await self.backend.run(
+            "INSERT INTO token_buckets (key, tat) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET tat=MAX(tat, ?) + ? RETURNING tat",
+            (self.name, now + interval, now, interval))
+        wait = rows[0][0] - now - self.burst / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State in one SQLite file in WAL mode, shared by every worker process.
+
+    Each call is a single short statement run in a worker thread, so the
+    event loop never blocks on the file lock of another process.
+    """
+
+    shared = True
+
+    def __init__(self, path: Optional[str] = None, purge_interval: Optional[float] = None):
+        self.path = path or settings.state_path
+        self.purge_interval = purge_interval or settings.state_purge_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._purger: Optional[asyncio.Task] = None
+        self._stores: List[SQLiteKeyValueStore] = []
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(kv)")}
+        if "written_at" not in columns:
+            conn.execute("ALTER TABLE kv ADD COLUMN written_at REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_written ON kv (ns, written_at)")
+        self._conn = conn
+
+    def _execute(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            if self._conn is None:
+                # Lazily opened for code paths running outside the lifespan (scripts, tests)
+                self._open()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _execute_transaction(self, body: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            if self._conn is None:
+                self._open()
+            # IMMEDIATE takes the write lock up front, so other processes cannot write in between
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = body(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    async def run(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def transaction(self, body: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run ``body(connection)`` in a worker thread inside one write transaction."""
+        return await asyncio.to_thread(self._execute_transaction, body)
+
+    def kv(self, name: str, max_size: int, ttl: float) -> KeyValueStore:
+        store = SQLiteKeyValueStore(self, name, max_size, ttl)
+        self._stores.append(store)
+        return store
+
+    def token_bucket(self, name: str, rate: float, burst: float) -> SQLiteTokenBucket:
+        return SQLiteTokenBucket(self, name, rate, burst)
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._execute, "SELECT 1", ())
+        if self._purger is None:
+            self._purger = asyncio.create_task(self._purge_expired(), name="state-purge")
+
+    async def aclose(self) -> None:
+        if self._purger is not None:
+            self._purger.cancel()
+            await asyncio.gather(self._purger, return_exceptions=True)
+            self._purger = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _purge_expired(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self.run("DELETE FROM kv WHERE expires_at<=?", (time.time(),))
+                for store in self._stores:
+                    await store.trim()
+            except Exception as e:
+                logger.warning(f"Failed to purge expired state: {e}")
+
+
+def create_state_backend() -> StateBackend:
+    if settings.state_backend == "sqlite":
+        return SQLiteStateBackend()
+    return MemoryStateBackend()
+
+
+state_backend = create_state_backend()
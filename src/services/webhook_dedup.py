@@ -0,0 +1,48 @@
+"""
+Deduplication of Green API notifications by ``idMessage``.
+
+Green API redelivers a notification when our acknowledgement is slow, so
+the same message may arrive several times, possibly at another worker.
+Seen ids are remembered for a limited time in the state backend and
+repeats are acknowledged without any downstream work.
+"""
+
+from typing import Optional
+
+from src.config.settings import settings
+from src.services.state_backend import state_backend
+
+
+class WebhookDeduplicator:
+    """
+    Bounded set of recently seen message ids with time-based expiry.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self._seen = state_backend.kv(
+            "webhook-dedup",
+            max_size or settings.webhook_dedup_size,
+            settings.webhook_dedup_ttl if ttl is None else ttl,
+        )
+        self.duplicates = 0
+
+    async def check_and_mark(self, id_message: Optional[str]) -> bool:
+        """
+        Record the id and return True if it is new, False if it is a repeat.
+
+        Notifications without an id are always treated as new.
+        """
+        if not id_message:
+            return True
+        if await self._seen.add(id_message):
+            return True
+        self.duplicates += 1
+        return False
+
+    async def forget(self, id_message: Optional[str]) -> None:
+        """Allow a redelivery of a message we did not manage to accept."""
+        if id_message:
+            await self._seen.delete(id_message)
+
+
+webhook_dedup = WebhookDeduplicator()
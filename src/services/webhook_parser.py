@@ -0,0 +1,58 @@
+"""
+Fast path for classifying Green API webhooks.
+
+Most notifications (statuses, outgoing messages, calls, instance state)
+are of no interest to us. Their type is read straight from the raw bytes
+so they can be acknowledged without building a dict; only relevant
+payloads are validated in full, with pre-built TypeAdapters.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+import orjson
+from pydantic import TypeAdapter
+
+from src.models.webhook import IncomingMessageWebhook, OutgoingMessageStatusWebhook
+
+# Green API puts typeWebhook first, so the search normally stops after a few bytes.
+# A `"` directly after the key can only come from a real key: quotes inside
+# string values are escaped.
+_TYPE_WEBHOOK_RE = re.compile(rb'"typeWebhook"\s*:\s*"([A-Za-z]+)"')
+
+incoming_message_adapter: TypeAdapter[IncomingMessageWebhook] = TypeAdapter(IncomingMessageWebhook)
+message_status_adapter: TypeAdapter[OutgoingMessageStatusWebhook] = TypeAdapter(OutgoingMessageStatusWebhook)
+
+# typeWebhook -> adapter for the payloads we process
+ADAPTERS: Dict[str, TypeAdapter] = {
+    "incomingMessageReceived": incoming_message_adapter,
+    "outgoingMessageStatus": message_status_adapter,
+}
+
+
+def read_type_webhook(raw: bytes) -> Optional[str]:
+    """
+    Return the typeWebhook of a raw payload, or None if it has none.
+    """
+    match = _TYPE_WEBHOOK_RE.search(raw)
+    if match is not None:
+        return match.group(1).decode()
+    # Unusual formatting (escapes, non-ASCII): fall back to a full parse
+    try:
+        data = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        type_webhook = data.get("typeWebhook")
+        return type_webhook if isinstance(type_webhook, str) else None
+    return None
+
+
+def parse_raw(raw: bytes, type_webhook: str) -> Any:
+    """Validate a relevant raw payload (raises pydantic.ValidationError)."""
+    return ADAPTERS[type_webhook].validate_json(raw)
+
+
+def parse_dict(data: Dict[str, Any], type_webhook: str) -> Any:
+    """Validate a relevant already-decoded payload (raises pydantic.ValidationError)."""
+    return ADAPTERS[type_webhook].validate_python(data)
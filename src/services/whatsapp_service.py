@@ -2,17 +2,16 @@ from src.models.whatsapp_message import WhatsAppMessageRequest, WhatsAppFileRequ
 from fastapi import HTTPException, UploadFile
 from pydantic import HttpUrl
 import logging
-from src.config.settings import settings
+from src.services.delivery_status import delivery_status
+from src.services.instance_pool import instance_pool
+from src.services.journal import journal
+from src.services.media_relay import media_relay, MediaSourceError, MediaTooLargeError
 import httpx
-import requests
-from typing import List, Optional
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Union
 
-async def send_whatsapp_message(request: WhatsAppMessageRequest) -> dict:
-    """
-    Sending a WhatsApp message
-    """
-    # Example: Use settings.whatsapp_api_key in real API call
-    # api_key = settings.whatsapp_api_key
+
+def validate_message_request(request: WhatsAppMessageRequest) -> None:
     if not request.recipient.startswith('+') or not request.recipient[1:].isdigit():
         logging.error(f"Invalid recipient format: {request.recipient}")
         raise HTTPException(status_code=400, detail="Recipient must be in international format, e.g., +1234567890.")
@@ -20,28 +19,72 @@ async def send_whatsapp_message(request: WhatsAppMessageRequest) -> dict:
         logging.error("Message body is empty.")
         raise HTTPException(status_code=400, detail="Message body cannot be empty.")
 
-    url = f"{settings.api_url}/waInstance{settings.id_instance}/sendMessage/{settings.api_token_instance}"
+
+async def _tracked(kind: str, request: Union[WhatsAppMessageRequest, WhatsAppFileRequest, Dict[str, Any]],
+                   send: Awaitable[dict]) -> dict:
+    """
+    Await a send, record the request with its outcome in the journal and
+    register the returned idMessage for delivery status lookups.
+    ``request`` is the request model, or a dict with ``recipient`` for sends
+    that have none.
+    """
+    started = time.perf_counter()
+    try:
+        result = await send
+    except Exception as exc:
+        if journal.active:
+            journal.record("send", kind=kind, request=_journaled(request), ok=False,
+                           error=f"{type(exc).__name__}: {exc}", ms=round((time.perf_counter() - started) * 1000, 1))
+        raise
+    if journal.active:
+        journal.record("send", kind=kind, request=_journaled(request), ok=True,
+                       result=result, ms=round((time.perf_counter() - started) * 1000, 1))
+    if isinstance(result, dict):
+        recipient = request["recipient"] if isinstance(request, dict) else request.recipient
+        try:
+            await delivery_status.note_sent(result.get("idMessage"), recipient)
+        except Exception as exc:
+            # The message went out: failing the request now would make the caller send it again
+            logging.error(f"Could not register {result.get('idMessage')} for status lookups: {exc}")
+    return result
+
+
+def _journaled(request: Union[WhatsAppMessageRequest, WhatsAppFileRequest, Dict[str, Any]]) -> Dict[str, Any]:
+    return request if isinstance(request, dict) else request.model_dump(mode="json")
+
+
+async def deliver_message(request: WhatsAppMessageRequest) -> dict:
+    """
+    Call Green API sendMessage. Upstream errors are raised as httpx exceptions.
+    """
     payload = {
         "chatId": f"{request.recipient.replace('+', '')}@c.us",
         "message": request.message
     }
     if request.media_url:
         payload["file"] = str(request.media_url)  # Convert HttpUrl to string
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPStatusError as exc:
-        logging.error(f"Green API error: {exc.response.status_code} - {exc.response.text}")
-        raise HTTPException(status_code=502, detail=f"WhatsApp API error: {exc.response.text}")
-    except Exception as exc:
-        logging.error(f"Unexpected error: {exc}")
-        raise HTTPException(status_code=500, detail="Internal server error while sending WhatsApp message.")
+    return await _tracked("message", request,
+                          instance_pool.call(request.recipient, lambda client: client.send_message(payload)))
+
 
+async def deliver_file(request: WhatsAppFileRequest, prepared: Optional[Awaitable[str]] = None) -> dict:
+    """
+    Call Green API sendFileByUrl, or relay the file with sendFileByUpload in
+    `upload` mode. In `upload` mode ``prepared`` may resolve to the urlFile
+    of the file already stored with media_relay.prepare. Upstream errors are
+    raised as httpx exceptions.
+    """
+    if request.mode == "upload" and prepared is not None:
+        async def send_prepared() -> dict:
+            return await media_relay.send_prepared(
+                request.recipient, await prepared, "file." + request.extension, request.caption)
 
-async def send_whatsapp_file(request: WhatsAppFileRequest) -> dict:
-    url = f"{settings.api_url}/waInstance{settings.id_instance}/sendFileByUrl/{settings.api_token_instance}"
+        return await _tracked("file", request, send_prepared())
+
+    if request.mode == "upload":
+        return await _tracked("file", request, media_relay.send_from_url(
+            request.recipient, str(request.file_url), "file." + request.extension, request.caption
+        ))
 
     payload = {
     "chatId": f"{request.recipient.replace('+', '')}@c.us", 
@@ -52,18 +95,68 @@ async def send_whatsapp_file(request: WhatsAppFileRequest) -> dict:
     if request.caption:
         payload["caption"] = request.caption
 
-    headers = {
-        'Content-Type': 'application/json'
-    }
+    return await _tracked("file", request,
+                          instance_pool.call(request.recipient, lambda client: client.send_file_by_url(payload)))
+
 
+async def deliver(request: Union[WhatsAppMessageRequest, WhatsAppFileRequest]) -> dict:
+    if isinstance(request, WhatsAppFileRequest):
+        return await deliver_file(request)
+    return await deliver_message(request)
+
+
+async def send_whatsapp_message(request: WhatsAppMessageRequest) -> dict:
+    """
+    Sending a WhatsApp message
+    """
+    validate_message_request(request)
+    try:
+        return await deliver_message(request)
+    except httpx.HTTPStatusError as exc:
+        logging.error(f"Green API error: {exc.response.status_code} - {exc.response.text}")
+        raise HTTPException(status_code=502, detail=f"WhatsApp API error: {exc.response.text}")
+    except Exception as exc:
+        logging.error(f"Unexpected error: {exc}")
+        raise HTTPException(status_code=500, detail="Internal server error while sending WhatsApp message.")
+
+
+async def send_whatsapp_file(request: WhatsAppFileRequest, prepared: Optional[Awaitable[str]] = None) -> dict:
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as exc:
-        logging.error(f"Green API error: {response.status_code} - {response.text}")
-        raise HTTPException(status_code=502, detail=f"WhatsApp API error: {response.text}")
+        return await deliver_file(request, prepared)
+    except MediaTooLargeError as exc:
+        logging.error(f"Media error: {exc}")
+        raise HTTPException(status_code=413, detail=str(exc))
+    except MediaSourceError as exc:
+        logging.error(f"Media error: {exc}")
+        raise HTTPException(status_code=502, detail=str(exc))
+    except httpx.HTTPStatusError as exc:
+        logging.error(f"Green API error: {exc.response.status_code} - {exc.response.text}")
+        raise HTTPException(status_code=502, detail=f"WhatsApp API error: {exc.response.text}")
     except Exception as exc:
         logging.error(f"Unexpected error: {exc}")
         raise HTTPException(status_code=500, detail="Internal server error while sending WhatsApp image.")
 
+
+async def send_whatsapp_upload(recipient: str, file: UploadFile, caption: Optional[str] = None) -> dict:
+    """
+    Relay a file posted to this service (e.g. a private file) with sendFileByUpload.
+    """
+    async def chunks():
+        while chunk := await file.read(64 * 1024):
+            yield chunk
+
+    file_name = file.filename or "file"
+    # The file itself is not journaled, so these records are not replayed
+    request = {"recipient": recipient, "file_name": file_name, "caption": caption,
+               "content_type": file.content_type, "size": file.size}
+    try:
+        return await _tracked("upload", request, media_relay.send_from_stream(recipient, chunks(), file_name, caption))
+    except MediaTooLargeError as exc:
+        logging.error(f"Media error: {exc}")
+        raise HTTPException(status_code=413, detail=str(exc))
+    except httpx.HTTPStatusError as exc:
+        logging.error(f"Green API error: {exc.response.status_code} - {exc.response.text}")
+        raise HTTPException(status_code=502, detail=f"WhatsApp API error: {exc.response.text}")
+    except Exception as exc:
+        logging.error(f"Unexpected error: {exc}")
+        raise HTTPException(status_code=500, detail="Internal server error while sending WhatsApp file.")
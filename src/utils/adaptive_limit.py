@@ -0,0 +1,124 @@
+"""
+Latency-driven adaptive concurrency limit (AIMD with a gradient signal).
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class LimitExceededError(Exception):
+    """The call was shed: too many callers are already waiting for a slot."""
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that follows the latency of the protected upstream.
+
+    Every completed call is compared with a slow moving average of past
+    latencies. When a call is much slower than that baseline (``tolerance``
+    times) or fails, the upstream is queueing work, so the limit is cut
+    multiplicatively, at most once per baseline round trip so a burst of
+    slow completions counts as one signal. Otherwise, while the limit is actually in use, it
+    grows by about one slot per ``limit`` completions.
+
+    Callers over the limit wait in FIFO order; at most ``max_waiters`` may
+    wait and none longer than ``max_wait`` seconds, beyond that calls fail
+    fast with LimitExceededError.
+    """
+
+    def __init__(
+        self,
+        initial: float = 10,
+        min_limit: float = 1,
+        max_limit: float = 200,
+        tolerance: float = 2.0,
+        backoff: float = 0.75,
+        max_waiters: int = 100,
+        max_wait: Optional[float] = None,
+        smoothing: float = 0.05,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self.smoothing = smoothing
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self.shed = 0
+        self._decreased_at = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_waiters:
+            self.shed += 1
+            raise LimitExceededError(f"{self.in_flight} calls in flight, {len(self._waiters)} waiting")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over by release(), in_flight is already counted for us
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return
+            self._forget(waiter)
+            self.shed += 1
+            raise LimitExceededError(f"No free slot within {self.max_wait}s") from None
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._release_slot()
+            else:
+                self._forget(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        Free a slot and adjust the limit.
+
+        ``latency`` is the duration of a completed call (None if it did not
+        complete, e.g. was cancelled); ``overloaded`` marks a timeout or
+        a server error.
+        """
+        if overloaded:
+            self._decrease()
+        elif latency is not None:
+            if self.baseline is None:
+                self.baseline = latency
+            elif latency > self.baseline * self.tolerance:
+                self._decrease()
+            elif self.in_flight >= self.limit / 2:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.baseline += (latency - self.baseline) * self.smoothing
+        self._release_slot()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._decreased_at >= (self.baseline or 0.0):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._decreased_at = now
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
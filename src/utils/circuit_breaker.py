@@ -0,0 +1,68 @@
+"""
+Circuit breaker for calls to an unreliable upstream.
+"""
+
+import time
+
+
+class CircuitOpenError(Exception):
+    """The circuit is open: the call was rejected without reaching the upstream."""
+
+
+class CircuitBreaker:
+    """
+    closed    - calls pass; ``failure_threshold`` consecutive failures open the circuit
+    open      - calls fail immediately with CircuitOpenError for ``open_seconds``
+    half_open - up to ``probes`` trial calls pass; a success closes the circuit,
+                a failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 15.0, probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+        self._state = "closed"
+        self._probing = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+            self._state = "half_open"
+            self._probing = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go through."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and self._probing < self.probes:
+            self._probing += 1
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f"Circuit is {state}, retry in {self.retry_after():.1f}s")
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._state = "closed"
+        self._probing = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self._state != "open":
+                self.opened += 1
+            self._state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """The call ended without telling anything about the upstream (e.g. cancelled)."""
+        if self._state == "half_open":
+            self._probing = max(0, self._probing - 1)
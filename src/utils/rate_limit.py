@@ -0,0 +1,36 @@
+"""
+Async token bucket for pacing calls to rate-limited upstreams.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Classic token bucket: ``rate`` tokens per second, at most ``burst`` stored.
+
+    Waiters are served in FIFO order. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
@@ -0,0 +1,65 @@
+"""
+Single-flight calls: concurrent callers of the same key share one call.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Futures of the calls in progress, by key.
+
+    The first caller of a key runs the call inside ``lead(key)`` and sets the
+    future's result; the others find the future with ``get(key)`` and wait on
+    it with ``asyncio.shield``, so a waiter going away does not cancel the call.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.Future, Any]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def get(self, key: Hashable) -> Optional[asyncio.Future]:
+        call = self._calls.get(key)
+        return call[0] if call is not None else None
+
+    def tag(self, key: Hashable) -> Any:
+        """The ``tag`` the call in progress for ``key`` was started with."""
+        call = self._calls.get(key)
+        return call[1] if call is not None else None
+
+    def forget(self, key: Hashable) -> None:
+        """Let the next caller start a new call; waiters of the current one still get its result."""
+        self._calls.pop(key, None)
+
+    @contextmanager
+    def lead(self, key: Hashable, tag: Any = None,
+             cancelled: Optional[Exception] = None) -> Iterator[asyncio.Future]:
+        """
+        Register the future of a new call for ``key``; the block sets its result.
+
+        The future is registered before the caller's first await, so concurrent
+        callers wait for it. If the block raises, waiters get the exception
+        (``cancelled``, or a RuntimeError, if the leader was cancelled). The key
+        is released when the block exits.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, tag)
+        try:
+            yield future
+        except BaseException as e:
+            if not future.done():
+                if not isinstance(e, Exception):
+                    e = cancelled or RuntimeError("Call was cancelled")
+                future.set_exception(e)
+                future.exception()  # mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            if self.get(key) is future:
+                del self._calls[key]
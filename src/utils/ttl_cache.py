@@ -0,0 +1,67 @@
+"""
+Bounded in-process cache with per-entry expiry and LRU eviction.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    Dict-like cache bounded to ``max_size`` entries.
+
+    Lookups and inserts are O(1). Expired entries are removed lazily on
+    access; when the cache is full the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def add(self, key: Hashable, value: V = True, ttl: Optional[float] = None) -> bool:
+        """Insert only if the key is absent (or expired). Returns True if inserted."""
+        if key in self:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def clear(self) -> None:
+        self._data.clear()